@@ -1,8 +1,15 @@
+import os
+import secrets
 from flask import Flask
 from flask_cors import CORS
 from database.db_setup import init_db
+from detectors.model_registry import init_models
+from detectors.inference_scheduler import init_scheduler
 from routes.auth_routes import auth_bp
 from routes.book_identifier_route import book_identifier_bp
+from routes.book_routes import book_bp
+from routes.metrics_route import metrics_bp
+from utils.tracing import init_tracing
 
 def create_app():
     app = Flask(__name__)
@@ -16,24 +23,30 @@ def create_app():
         }
     })
     
+    # Signs access tokens. Every worker must share it, or a token issued by
+    # one is rejected by the others and each restart logs everyone out
+    secret_key = os.getenv("SECRET_KEY")
+    if not secret_key:
+        if not (app.debug or app.testing):
+            raise RuntimeError("SECRET_KEY is not set. Set it to the same random value for every worker "
+                               "(or FLASK_DEBUG=1 for local development).")
+        secret_key = secrets.token_hex(32)
+        print("WARNING: SECRET_KEY is not set; using a random key for this process (debug only)")
+    app.config["SECRET_KEY"] = secret_key
+
     init_db(app)
     app.register_blueprint(auth_bp, url_prefix='/auth')
     app.register_blueprint(book_identifier_bp, url_prefix='/books')
+    app.register_blueprint(book_bp, url_prefix='/books')
+    app.register_blueprint(metrics_bp)
+    init_tracing(app)
+
+    # Load YOLO and EasyOCR once per worker (set MODEL_LOAD_MODE=lazy to defer)
+    init_models(app)
+    init_scheduler(app)
     return app
 
 app = create_app()
 
-#initialize YOLO model
-# device  = "cpu" 
-# model = YOLO('models/best.pt').to(device)
-# """ if you have a GPU, you can run this code 
-#           model = YOLO('models/best.pt')
-# """
-
-#initialize easyocr reader
-# reader = easyocr.Reader(['en'],gpu=False)
-
-
-
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""Concurrent signup/login load generator for the /auth routes.
+
+    python -m benchmarks.auth_load_test --users 200 --concurrency 16 --output auth.json
+
+Drives the Flask app in-process through its test client against a
+throwaway SQLite database. Reports signup and login requests/sec, latency
+percentiles and status codes (503 = shed by the hashing pool). A probe
+thread times a small CPU-bound task throughout, standing in for the
+vision pipeline, to show whether auth traffic starves it.
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import summarise_ms, peak_rss_mb, write_report
+
+PASSWORD = "correct horse battery"
+
+
+def _probe_work():
+    total = 0
+    for i in range(20000):
+        total += i * i
+    return total
+
+
+class _Probe:
+
+    """Repeatedly time a fixed CPU-bound task on its own thread"""
+
+    def __init__(self):
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="auth-probe", daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            start = time.perf_counter()
+            _probe_work()
+            self.samples.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return summarise_ms(self.samples)
+
+
+def _phase(client_factory, requests_, concurrency):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    it = iter(requests_)
+
+    def worker():
+        client = client_factory()
+        while True:
+            with lock:
+                item = next(it, None)
+            if item is None:
+                return
+            path, body = item
+            start = time.perf_counter()
+            response = client.post(path, json=body)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies.append(elapsed_ms)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'requests_per_second': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'latency': summarise_ms(latencies),
+    }
+
+
+def run(users=100, concurrency=8) -> dict:
+    db_dir = tempfile.mkdtemp(prefix="auth-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(db_dir, 'auth.db')}")
+    # Auth does not need the vision models
+    os.environ.setdefault("MODEL_LOAD_MODE", "lazy")
+    # Tokens only need to verify within this process
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+    from app import app
+    from database.db_setup import db
+    from services.password_hasher import password_hasher
+
+    with app.app_context():
+        db.create_all()
+
+    baseline = _Probe().start()
+    time.sleep(1.0)
+    baseline_stats = baseline.stop()
+
+    signups = [('/auth/signup', {'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password': PASSWORD})
+               for i in range(users)]
+    logins = [('/auth/login', {'email': f'bench{i}@example.com', 'password': PASSWORD}) for i in range(users)]
+
+    probe = _Probe().start()
+    signup = _phase(app.test_client, signups, concurrency)
+    login = _phase(app.test_client, logins, concurrency)
+    probe_stats = probe.stop()
+
+    return {
+        'users': users,
+        'concurrency': concurrency,
+        'signup': signup,
+        'login': login,
+        'probe_baseline': baseline_stats,
+        'probe_under_load': probe_stats,
+        'hashing': password_hasher.stats(),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test signup and login in-process')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output', default='auth_load_test.json')
+    args = parser.parse_args(argv)
+
+    report = run(users=args.users, concurrency=args.concurrency)
+    write_report({'benchmark': 'auth_load_test', **report}, args.output)
+
+    for phase in ('signup', 'login'):
+        stats = report[phase]
+        print(f"{phase:7} {stats['requests_per_second']} req/sec  p50 {stats['latency']['p50_ms']:.1f} ms  "
+              f"p95 {stats['latency']['p95_ms']:.1f} ms  statuses {stats['status_codes']}")
+    print(f"probe p95 {report['probe_baseline']['p95_ms']:.2f} ms idle, "
+          f"{report['probe_under_load']['p95_ms']:.2f} ms under auth load")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
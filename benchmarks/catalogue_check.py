@@ -0,0 +1,79 @@
+"""Check local catalogue matching offline against the bundled sample catalogue.
+
+    python -m benchmarks.catalogue_check [--catalogue path.csv] [--output catalogue_check.json]
+
+Every book in the catalogue must be matched from its title and from
+"title author" as a spine would show them, a few partial and misread
+spines must still find their book, and common words and books missing
+from the catalogue must not match anything. Exits with status 1 if any
+check fails.
+"""
+
+import sys
+import argparse
+from benchmarks.common import write_report
+from identifier.catalogue import CatalogueIndex, read_catalogue, SAMPLE_CATALOGUE_PATH, CATALOGUE_MATCH_THRESHOLD
+
+# Partial or misread spines of sample catalogue books, with the title they should match
+PARTIAL_READS = [
+    ("HOBBIT", "The Hobbit"),
+    ("GREAT GATSBY", "The Great Gatsby"),
+    ("MOBY DICK MELVILLE", "Moby-Dick"),
+    ("DUNE FRANK HERBRT", "Dune"),
+    ("SAPIENS HARARI", "Sapiens"),
+    ("ATOMIC HABlTS", "Atomic Habits"),
+]
+
+# Fragments a spine read can produce that must go to the LLM instead
+NO_MATCH = ["THE", "the", "LOVE", "AND", "OF THE", "A", "BOOK", "NOVEL", "VOLUME 1",
+            "WAR AND PEACE TOLSTOY", "THE ODYSSEY HOMER"]
+
+
+def _check(index, query, expected, threshold) -> dict:
+    match = index.match(query, threshold=threshold)
+    title = match["title"] if match else None
+    return {
+        'query': query,
+        'expected': expected,
+        'matched': title,
+        'score': match["score"] if match else None,
+        'ok': title == expected,
+    }
+
+
+def run(path=SAMPLE_CATALOGUE_PATH, threshold=CATALOGUE_MATCH_THRESHOLD) -> list:
+    books = read_catalogue(path)
+    index = CatalogueIndex(books)
+
+    checks = []
+    for book in books:
+        checks.append(_check(index, book["title"].upper(), book["title"], threshold))
+        checks.append(_check(index, f"{book['title']} {book.get('author', '')}".upper(), book["title"], threshold))
+    for query, title in PARTIAL_READS:
+        checks.append(_check(index, query, title, threshold))
+    for query in NO_MATCH:
+        checks.append(_check(index, query, None, threshold))
+    return checks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check catalogue matching against the sample catalogue')
+    parser.add_argument('--catalogue', default=SAMPLE_CATALOGUE_PATH)
+    parser.add_argument('--threshold', type=float, default=CATALOGUE_MATCH_THRESHOLD)
+    parser.add_argument('--output', default='catalogue_check.json')
+    args = parser.parse_args(argv)
+
+    checks = run(args.catalogue, args.threshold)
+    write_report({'benchmark': 'catalogue_check', 'threshold': args.threshold, 'checks': checks}, args.output)
+
+    for check in checks:
+        if not check['ok']:
+            print(f"FAIL  {check['query']!r}: expected {check['expected']!r}, "
+                  f"matched {check['matched']!r} ({check['score']})")
+    passed = sum(check['ok'] for check in checks)
+    print(f"{passed}/{len(checks)} catalogue checks passed")
+    return 0 if passed == len(checks) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Compare OCR on spines cropped from the 640x640 model input against
+spines cropped from the full-resolution photo.
+
+    python -m benchmarks.crop_resolution path/to/shelf_images [--output crop_resolution.json]
+
+For every image the spines are detected once, then both crop sets go
+through the same batched OCR. Reports OCR time and mean text confidence
+per variant.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import cv2
+import numpy as np
+from detectors import spine_detector
+from detectors.ocr_engine import read_crops
+from detectors.spine_orientation import rotate_crop
+from utils.image_utils import preprocess_image , crop_image , map_boxes_to_original
+from services.identification_pipeline import DETECTION_CONFIDENCE, CROP_MAX_SIDE
+from benchmarks.common import list_images, write_report
+
+
+def _rotate(crops) -> list:
+    # A fixed rotation keeps the two crop variants comparable
+    return [rotate_crop(crop, 90) for crop in crops if crop.size]
+
+
+def _ocr_stats(crops) -> dict:
+    start = time.perf_counter()
+    outputs = read_crops(crops)
+    elapsed = time.perf_counter() - start
+
+    confidences = [conf for texts in outputs for _, conf in texts]
+    return {
+        'ocr_seconds': elapsed,
+        'texts': len(confidences),
+        'mean_confidence': float(np.mean(confidences)) if confidences else 0.0,
+    }
+
+
+def run(image_dir) -> dict:
+    per_image = []
+    for path in list_images(image_dir):
+        name = os.path.basename(path)
+        img = cv2.imread(path)
+        if img is None:
+            continue
+
+        model_img, transform = preprocess_image(img , target_size=(640,640) , to_rgb=True , keep_aspect_ratio=True , return_transform=True)
+        results = spine_detector.spine_detector(model_img, confidence_threshold=DETECTION_CONFIDENCE)
+        if not results:
+            continue
+
+        # Model-input crops are converted back to BGR, as the pipeline used to do
+        model_crops = [cv2.cvtColor(c, cv2.COLOR_RGB2BGR) for c in crop_image(model_img , results)]
+        full_crops = crop_image(img , map_boxes_to_original(results, transform), max_side=CROP_MAX_SIDE)
+
+        per_image.append({
+            'image': name,
+            'spines': len(results),
+            'model_input': _ocr_stats(_rotate(model_crops)),
+            'full_resolution': _ocr_stats(_rotate(full_crops)),
+        })
+        print(f"{name}: {len(results)} spines")
+
+    summary = {}
+    for variant in ('model_input', 'full_resolution'):
+        stats = [item[variant] for item in per_image]
+        texts = sum(s['texts'] for s in stats)
+        summary[variant] = {
+            'ocr_seconds_total': round(sum(s['ocr_seconds'] for s in stats), 3),
+            'texts': texts,
+            'mean_confidence': round(sum(s['mean_confidence'] * s['texts'] for s in stats) / texts, 4) if texts else 0.0,
+        }
+
+    return {'images': len(per_image), 'crop_max_side': CROP_MAX_SIDE, 'summary': summary, 'per_image': per_image}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare OCR on model-input crops and full-resolution crops')
+    parser.add_argument('image_dir')
+    parser.add_argument('--output', default='crop_resolution.json')
+    args = parser.parse_args(argv)
+
+    report = run(args.image_dir)
+    write_report({'benchmark': 'crop_resolution', **report}, args.output)
+    print(json.dumps(report['summary'], indent=2))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""Check that the ONNX spine detector matches the PyTorch one.
+
+    python -m benchmarks.detector_parity path/to/shelf_images --tolerance 2 --output parity.json
+
+Runs both backends on the same preprocessed 640x640 inputs, pairs boxes
+by IoU and fails (exit code 1) when any box is unmatched or differs by
+more than `--tolerance` pixels or `--conf-tolerance` in confidence. Also
+reports each backend's detection latency.
+"""
+
+import sys
+import time
+import argparse
+import cv2
+from benchmarks.common import list_images, summarise_ms, write_report
+from detectors.detector_backends import load_backend, SPINE_ONNX_PATH
+from detectors.model_registry import SPINE_MODEL_PATH
+from services.identification_pipeline import DETECTION_CONFIDENCE
+from utils.image_utils import preprocess_image
+
+
+def _iou(a, b) -> float:
+    w = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    h = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = w * h
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union else 0.0
+
+
+def compare(reference, candidate, tolerance, conf_tolerance) -> dict:
+
+    """Greedily pair boxes by IoU and measure how far each pair is apart"""
+
+    unmatched = list(range(len(candidate)))
+    max_box_diff = 0.0
+    max_conf_diff = 0.0
+    missing = 0
+
+    for ref in reference:
+        best = max(unmatched, key=lambda j: _iou(ref['box'], candidate[j]['box']), default=None)
+        if best is None or _iou(ref['box'], candidate[best]['box']) < 0.5:
+            missing += 1
+            continue
+        unmatched.remove(best)
+        max_box_diff = max(max_box_diff, *(abs(r - c) for r, c in zip(ref['box'], candidate[best]['box'])))
+        max_conf_diff = max(max_conf_diff, abs(ref['confidence'] - candidate[best]['confidence']))
+
+    return {
+        'reference_boxes': len(reference),
+        'candidate_boxes': len(candidate),
+        'missing': missing,
+        'extra': len(unmatched),
+        'max_box_diff_px': max_box_diff,
+        'max_conf_diff': round(max_conf_diff, 4),
+        'ok': missing == 0 and not unmatched and max_box_diff <= tolerance and max_conf_diff <= conf_tolerance,
+    }
+
+
+def run(image_paths, onnx_path=SPINE_ONNX_PATH, tolerance=2.0, conf_tolerance=0.02) -> dict:
+    torch_backend = load_backend("torch", weights=SPINE_MODEL_PATH)
+    onnx_backend = load_backend("onnx", weights=onnx_path)
+
+    per_image = []
+    latency = {'torch': [], 'onnx': []}
+    for path in image_paths:
+        img = cv2.imread(path)
+        if img is None:
+            continue
+        model_img = preprocess_image(img , target_size=(640,640) , to_rgb=True , keep_aspect_ratio=True)
+
+        detections = {}
+        for name, backend in (('torch', torch_backend), ('onnx', onnx_backend)):
+            start = time.perf_counter()
+            detections[name] = backend.detect([model_img], DETECTION_CONFIDENCE)[0]
+            latency[name].append((time.perf_counter() - start) * 1000)
+
+        per_image.append({'image': path, **compare(detections['torch'], detections['onnx'], tolerance, conf_tolerance)})
+
+    return {
+        'onnx_model': onnx_path,
+        'tolerance_px': tolerance,
+        'conf_tolerance': conf_tolerance,
+        # No readable images means nothing was compared, which is not a pass
+        'ok': bool(per_image) and all(item['ok'] for item in per_image),
+        'images_compared': len(per_image),
+        'latency': {name: summarise_ms(values) for name, values in latency.items()},
+        'per_image': per_image,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare ONNX and PyTorch spine detector outputs')
+    parser.add_argument('image_dir')
+    parser.add_argument('--onnx', default=SPINE_ONNX_PATH)
+    parser.add_argument('--tolerance', type=float, default=2.0, help='Largest allowed box coordinate difference in pixels')
+    parser.add_argument('--conf-tolerance', type=float, default=0.02)
+    parser.add_argument('--output', default='detector_parity.json')
+    args = parser.parse_args(argv)
+
+    image_paths = list_images(args.image_dir)
+    if not image_paths:
+        parser.error(f"No images found in {args.image_dir}")
+
+    report = run(image_paths, onnx_path=args.onnx, tolerance=args.tolerance, conf_tolerance=args.conf_tolerance)
+    write_report({'benchmark': 'detector_parity', **report}, args.output)
+
+    for name, stats in report['latency'].items():
+        print(f"{name:6} p50 {stats['p50_ms']:.1f} ms  p95 {stats['p95_ms']:.1f} ms")
+    if not report['per_image']:
+        print(f"FAIL: none of the {len(image_paths)} images could be read")
+    else:
+        print("PASS" if report['ok'] else "FAIL: boxes differ beyond tolerance")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,163 @@
+"""Exercise the identifier's HTTP client against the local LLM stub.
+
+    python -m benchmarks.llm_client_check [--output llm_client.json]
+
+Each scenario starts a stub that answers with 429s or slow responses and
+checks that the client retries, honours Retry-After, hedges slow calls
+and opens its circuit breaker. The streaming scenarios check that a
+streamed call keeps its slot until closed, that a losing hedge is
+closed and that a reply cut off mid-stream counts against the breaker.
+Exits with status 1 if any check fails.
+"""
+
+import sys
+import time
+import argparse
+import threading
+from benchmarks.common import write_report
+from benchmarks.stub_llm import StubLLMServer
+from identifier.llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+
+PAYLOAD = {"messages": [{"role": "user", "content": 'OCR: [{"spine": 0, "ocr": "DUNE"}]'}]}
+STREAM_PAYLOAD = {**PAYLOAD, "stream": True}
+
+
+def _scenario(name, stub_options, client_options, calls=1):
+    stub = StubLLMServer(**stub_options).start()
+    client = LLMClient(backoff_base=0.05, **client_options)
+    outcomes = []
+    start = time.perf_counter()
+    try:
+        for _ in range(calls):
+            try:
+                outcomes.append(client.post(stub.url, PAYLOAD, timeout=5).status_code)
+            except CircuitOpenError:
+                outcomes.append("circuit_open")
+    finally:
+        stub.stop()
+    return {
+        'scenario': name,
+        'outcomes': outcomes,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        'server_requests': stub.requests,
+        'client': client.stats(),
+    }
+
+
+def _read_stream(response):
+    try:
+        for _ in response.iter_lines():
+            pass
+        return "read"
+    except Exception:
+        return "broken"
+    finally:
+        response.close()
+
+
+def _stream_scenario(name, stub_options, client_options, body):
+
+    """Run `body(client, url)` against a streaming stub; it returns the outcomes"""
+
+    stub = StubLLMServer(**stub_options).start()
+    client = LLMClient(backoff_base=0.05, **client_options)
+    start = time.perf_counter()
+    try:
+        outcomes = body(client, stub.url)
+    finally:
+        stub.stop()
+    return {
+        'scenario': name,
+        'outcomes': outcomes,
+        'elapsed_ms': round((time.perf_counter() - start) * 1000, 1),
+        'server_requests': stub.requests,
+        'client': client.stats(),
+    }
+
+
+def _slot_held_until_close(client, url):
+    first = client.post(url, STREAM_PAYLOAD, timeout=5, stream=True)
+    second = {}
+    waiter = threading.Thread(target=lambda: second.update(response=client.post(url, STREAM_PAYLOAD, timeout=5, stream=True)))
+    waiter.start()
+    waiter.join(0.3)
+    outcomes = ["waiting" if waiter.is_alive() else "not_waiting"]
+    outcomes.append(_read_stream(first))
+    waiter.join(5)
+    outcomes.append(_read_stream(second["response"]) if "response" in second else "missing")
+    return outcomes
+
+
+def _hedge_loser_closed(client, url):
+    outcomes = [_read_stream(client.post(url, STREAM_PAYLOAD, timeout=5, stream=True))]
+    # The slow primary finishes after the hedge has won; it should be closed, not leaked
+    time.sleep(1.5)
+    outcomes.append(client.stats()["in_flight"])
+    return outcomes
+
+
+def _broken_stream(client, url):
+    outcomes = [_read_stream(client.post(url, STREAM_PAYLOAD, timeout=5, stream=True))]
+    outcomes.append(client.stats()["breaker_state"])
+    return outcomes
+
+
+def run() -> list:
+    checks = []
+
+    result = _scenario('retries_429', {'fail_first': 2, 'retry_after': 0}, {'max_retries': 3})
+    result['ok'] = result['outcomes'] == [200] and result['server_requests'] == 3
+    checks.append(result)
+
+    result = _scenario('honours_retry_after', {'fail_first': 1, 'retry_after': 1}, {'max_retries': 1})
+    result['ok'] = result['outcomes'] == [200] and result['elapsed_ms'] >= 1000
+    checks.append(result)
+
+    result = _scenario('gives_up_after_retries', {'fail_first': 100, 'retry_after': 0}, {'max_retries': 2})
+    result['ok'] = result['outcomes'] == [429] and result['server_requests'] == 3
+    checks.append(result)
+
+    result = _scenario('hedges_slow_call', {'slow_first': 1, 'slow_ms': 3000}, {'hedge_after': 0.2})
+    result['ok'] = (result['outcomes'] == [200] and result['elapsed_ms'] < 2000
+                    and result['client']['hedge_wins'] == 1)
+    checks.append(result)
+
+    result = _scenario('opens_circuit', {'fail_first': 100, 'retry_after': 0},
+                       {'max_retries': 0, 'breaker': CircuitBreaker(threshold=2, cooldown=60)}, calls=4)
+    result['ok'] = (result['outcomes'] == [429, 429, 'circuit_open', 'circuit_open']
+                    and result['server_requests'] == 2)
+    checks.append(result)
+
+    result = _stream_scenario('stream_holds_slot', {}, {'max_concurrency': 1}, _slot_held_until_close)
+    result['ok'] = result['outcomes'] == ['waiting', 'read', 'read'] and result['client']['in_flight'] == 0
+    checks.append(result)
+
+    result = _stream_scenario('stream_closes_hedge_loser', {'slow_first': 1, 'slow_ms': 1000},
+                              {'hedge_after': 0.2}, _hedge_loser_closed)
+    result['ok'] = result['outcomes'] == ['read', 0] and result['client']['hedge_wins'] == 1
+    checks.append(result)
+
+    result = _stream_scenario('stream_error_counts_failure', {'drop_stream': True},
+                              {'breaker': CircuitBreaker(threshold=1, cooldown=60)}, _broken_stream)
+    result['ok'] = result['outcomes'] == ['broken', 'open'] and result['client']['failures'] == 1
+    checks.append(result)
+
+    return checks
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check LLM client retries, hedging and circuit breaking against a stub')
+    parser.add_argument('--output', default='llm_client_check.json')
+    args = parser.parse_args(argv)
+
+    checks = run()
+    write_report({'benchmark': 'llm_client_check', 'checks': checks}, args.output)
+
+    for check in checks:
+        print(f"{'PASS' if check['ok'] else 'FAIL'}  {check['scenario']:24} {check['outcomes']}  "
+              f"{check['elapsed_ms']} ms  {check['server_requests']} server requests")
+    return 0 if all(check['ok'] for check in checks) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
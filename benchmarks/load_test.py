@@ -0,0 +1,114 @@
+"""Concurrent load generator for POST /books/identifying_books.
+
+    python -m benchmarks.load_test path/to/shelf_images --concurrency 8 --requests 200 --output load.json
+
+Drives the Flask app in-process through its test client, one client per
+worker thread, with identify() pointed at a local LLM stub. Reports
+latency percentiles, requests/sec, status codes and peak RSS as JSON.
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.common import list_images, summarise_ms, peak_rss_mb, write_report
+from benchmarks.stub_llm import StubLLMServer
+
+
+def run(image_paths, concurrency=4, total_requests=50, llm_latency_ms=0.0, endpoint='/books/identifying_books') -> dict:
+
+    # The app needs a database URL at import time; the benchmark does not touch it
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    # Tokens only need to verify within this process
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+    from app import app
+    from identifier import book_identifier
+
+    stub = StubLLMServer(latency_ms=llm_latency_ms).start()
+    book_identifier.OPENROUTER_URL = stub.url
+
+    images = []
+    for path in image_paths:
+        with open(path, 'rb') as f:
+            images.append((os.path.basename(path), f.read()))
+
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+    latencies = []
+    statuses = {}
+    cache_hits = 0
+    results_lock = threading.Lock()
+
+    def worker():
+        nonlocal cache_hits
+        client = app.test_client()
+        while True:
+            with counter_lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            name, data = images[i % len(images)]
+
+            start = time.perf_counter()
+            response = client.post(endpoint, data={'image': (BytesIO(data), name)},
+                                   content_type='multipart/form-data')
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            body = response.get_json(silent=True) or {}
+            with results_lock:
+                latencies.append(elapsed_ms)
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if body.get('cache') == 'hit':
+                    cache_hits += 1
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for _ in range(concurrency):
+                pool.submit(worker)
+    finally:
+        stub.stop()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'endpoint': endpoint,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'distinct_images': len(images),
+        'status_codes': {str(code): count for code, count in sorted(statuses.items())},
+        'cache_hits': cache_hits,
+        'llm_stub_latency_ms': llm_latency_ms,
+        'llm_requests': stub.requests,
+        'requests_per_second': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'latency': summarise_ms(latencies),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the identify endpoint in-process')
+    parser.add_argument('image_dir')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='Delay added by the LLM stub')
+    parser.add_argument('--output', default='load_test.json')
+    args = parser.parse_args(argv)
+
+    image_paths = list_images(args.image_dir)
+    if not image_paths:
+        parser.error(f"No images found in {args.image_dir}")
+
+    report = run(image_paths, concurrency=args.concurrency, total_requests=args.requests,
+                 llm_latency_ms=args.llm_latency_ms)
+    write_report({'benchmark': 'load_test', **report}, args.output)
+
+    latency = report['latency']
+    print(f"{report['requests_per_second']} req/sec  p50 {latency['p50_ms']:.1f} ms  "
+          f"p95 {latency['p95_ms']:.1f} ms  p99 {latency['p99_ms']:.1f} ms  statuses {report['status_codes']}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+"""Offline benchmark of the full shelf pipeline.
+
+    python -m benchmarks.pipeline_bench path/to/shelf_images --repeat 3 --output pipeline.json
+
+Runs read_image -> preprocess_image -> spine_detector -> crop_image ->
+OCR -> identify() over every image, with identify() pointed at a local
+LLM stub. Reports per-stage p50/p95/p99, images/sec and peak RSS as JSON
+so results can be diffed between releases. With --batch-size N the images
+go through run_batch_pipeline() N at a time, as the batch endpoint does;
+compare its images/sec with a --batch-size 1 run.
+"""
+
+import sys
+import time
+import argparse
+from benchmarks.common import list_images, summarise_ms, peak_rss_mb, write_report
+from benchmarks.stub_llm import StubLLMServer
+from identifier import book_identifier
+from services import identification_pipeline
+from services.result_cache import ResultCache
+from detectors.model_registry import init_models, model_stats
+from utils.image_utils import read_image
+from utils.tracing import start_trace, trace_stage
+
+
+def run(image_paths, repeat=1, llm_latency_ms=0.0, warm_caches=False, batch_size=1) -> dict:
+
+    stub = StubLLMServer(latency_ms=llm_latency_ms).start()
+    book_identifier.OPENROUTER_URL = stub.url
+
+    if not warm_caches:
+        # Every pass should do the full work, not replay earlier results
+        identification_pipeline.result_cache = ResultCache(max_entries=0, db_path="")
+        book_identifier.spine_cache = ResultCache(max_entries=0, db_path="")
+
+    init_models()
+
+    stage_ms = {}
+    total_ms = []
+    processed = 0
+    errors = 0
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), max(1, batch_size))]
+    start = time.perf_counter()
+    try:
+        for _ in range(repeat):
+            for batch in batches:
+                with start_trace('benchmark') as trace:
+                    try:
+                        imgs = []
+                        for path in batch:
+                            with open(path, 'rb') as f:
+                                with trace_stage('read_image'):
+                                    imgs.append(read_image(f))
+                        if batch_size > 1:
+                            identification_pipeline.run_batch_pipeline(imgs)
+                        else:
+                            identification_pipeline.run_pipeline(imgs[0])
+                    except Exception as e:
+                        errors += 1
+                        print(f"{', '.join(batch)}: {e}")
+                for stage in trace.stages:
+                    stage_ms.setdefault(stage['stage'], []).append(stage['wall_ms'])
+                total_ms.append(trace.total_seconds * 1000)
+                processed += len(batch)
+    finally:
+        stub.stop()
+    elapsed = time.perf_counter() - start
+
+    return {
+        'images': len(image_paths),
+        'repeat': repeat,
+        'batch_size': batch_size,
+        'processed': processed,
+        'errors': errors,
+        'llm_stub_latency_ms': llm_latency_ms,
+        'llm_requests': stub.requests,
+        'images_per_second': round(processed / elapsed, 3) if elapsed else 0.0,
+        'total': summarise_ms(total_ms),
+        'stages': {name: summarise_ms(values) for name, values in stage_ms.items()},
+        'peak_rss_mb': peak_rss_mb(),
+        'models': model_stats(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the shelf identification pipeline offline')
+    parser.add_argument('image_dir')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--llm-latency-ms', type=float, default=0.0, help='Delay added by the LLM stub')
+    parser.add_argument('--warm-caches', action='store_true', help='Keep result and spine caches enabled')
+    parser.add_argument('--batch-size', type=int, default=1, help='Images per run_batch_pipeline() call (1 = one request per image)')
+    parser.add_argument('--output', default='pipeline_bench.json')
+    args = parser.parse_args(argv)
+
+    image_paths = list_images(args.image_dir)
+    if not image_paths:
+        parser.error(f"No images found in {args.image_dir}")
+
+    report = run(image_paths, repeat=args.repeat, llm_latency_ms=args.llm_latency_ms, warm_caches=args.warm_caches,
+                 batch_size=args.batch_size)
+    write_report({'benchmark': 'pipeline', **report}, args.output)
+
+    for name, stats in report['stages'].items():
+        print(f"{name:18} p50 {stats['p50_ms']:9.1f} ms  p95 {stats['p95_ms']:9.1f} ms  p99 {stats['p99_ms']:9.1f} ms")
+    print(f"{report['images_per_second']} images/sec, peak RSS {report['peak_rss_mb']} MB")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
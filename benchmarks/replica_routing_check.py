@@ -0,0 +1,73 @@
+"""Check read-replica routing with two local SQLite files.
+
+    python -m benchmarks.replica_routing_check [--output replica_routing.json]
+
+Points DATABASE_URL and DATABASE_REPLICA_URL at two fresh SQLite files,
+gives each a different user, then checks that queries inside
+read_replica() see the replica, that other queries and all writes go to
+the primary, and reports pool usage. Exits with status 1 on a mismatch.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+from benchmarks.common import write_report
+
+
+def run() -> dict:
+    db_dir = tempfile.mkdtemp(prefix="replica-check-")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(db_dir, 'primary.db')}"
+    os.environ["DATABASE_REPLICA_URL"] = f"sqlite:///{os.path.join(db_dir, 'replica.db')}"
+    os.environ.setdefault("MODEL_LOAD_MODE", "lazy")
+    # Tokens only need to verify within this process
+    os.environ.setdefault("SECRET_KEY", "benchmark-only-secret")
+    from app import app
+    from database.db_setup import db, read_replica, pool_stats
+    from database.models import User
+
+    checks = {}
+    with app.app_context():
+        primary, replica = db.engines[None], db.engines["replica"]
+        db.metadata.create_all(primary)
+        db.metadata.create_all(replica)
+        with primary.begin() as conn:
+            conn.execute(User.__table__.insert(), {"username": "on-primary", "email": "p@example.com", "password_hash": "x"})
+        with replica.begin() as conn:
+            conn.execute(User.__table__.insert(), {"username": "on-replica", "email": "r@example.com", "password_hash": "x"})
+
+        checks["default_reads_primary"] = User.query.first().username == "on-primary"
+        db.session.rollback()
+
+        with read_replica():
+            checks["replica_reads_replica"] = User.query.first().username == "on-replica"
+            # Writes stay on the primary even inside read_replica()
+            db.session.add(User(username="written", email="w@example.com", password_hash="x"))
+            db.session.commit()
+
+        with primary.connect() as conn:
+            checks["write_went_to_primary"] = conn.execute(
+                User.__table__.select().where(User.__table__.c.username == "written")).first() is not None
+        with replica.connect() as conn:
+            checks["write_skipped_replica"] = conn.execute(
+                User.__table__.select().where(User.__table__.c.username == "written")).first() is None
+
+        pools = pool_stats()
+
+    return {'checks': checks, 'ok': all(checks.values()), 'pools': pools}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check read-replica routing with two SQLite files')
+    parser.add_argument('--output', default='replica_routing.json')
+    args = parser.parse_args(argv)
+
+    report = run()
+    write_report({'benchmark': 'replica_routing_check', **report}, args.output)
+    for name, ok in report['checks'].items():
+        print(f"{'PASS' if ok else 'FAIL'}  {name}")
+    return 0 if report['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+"""Local stand-in for the OpenRouter chat completions API.
+
+    python -m benchmarks.stub_llm --port 8765 --latency-ms 800
+
+Answers every prompt with one book per numbered spine in the prompt,
+after a configurable delay, so the identify stage can be measured
+without network access, quotas or token spend. It can also answer the
+first requests with 429s or slow responses to exercise the client's
+retries and hedging, or cut streamed replies short.
+"""
+
+import re
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_OCR_LINE_RE = re.compile(r'^OCR: (.*)$', re.MULTILINE)
+_SPINE_RE = re.compile(r'"spine":\s*(\d+)')
+# Characters per streamed delta
+STREAM_PIECE_SIZE = 24
+
+
+def _books_for(prompt) -> list:
+    # Only the OCR line is read; the prompt's example output also mentions a spine
+    match = _OCR_LINE_RE.search(prompt)
+    ocr = match.group(1) if match else ""
+    return [
+        {
+            "spine": int(index),
+            "title": f"Stub Title {index}",
+            "ISBN": "N/A",
+            "author": "Stub Author",
+            "description": "Returned by the benchmark LLM stub",
+        }
+        for index in dict.fromkeys(_SPINE_RE.findall(ocr))
+    ]
+
+
+class StubLLMServer:
+
+    """Threaded HTTP server answering chat completion requests in the
+    OpenRouter response shape"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0.0, fail_first=0, retry_after=None,
+                 slow_first=0, slow_ms=0.0, drop_stream=False):
+        self.latency_ms = latency_ms
+        # The first `fail_first` requests get a 429 (with Retry-After if set),
+        # the next `slow_first` are delayed by `slow_ms` instead of `latency_ms`
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.slow_first = slow_first
+        self.slow_ms = slow_ms
+        # Streamed replies announce their full length, send half and drop the connection
+        self.drop_stream = drop_stream
+        self.requests = 0
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with server._lock:
+                    server.requests += 1
+                    n = server.requests
+
+                if n <= server.fail_first:
+                    body = json.dumps({"error": {"code": 429, "message": "quota_exceeded"}}).encode()
+                    self.send_response(429)
+                    if server.retry_after is not None:
+                        self.send_header("Retry-After", str(server.retry_after))
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    return
+
+                latency_ms = server.slow_ms if n <= server.fail_first + server.slow_first else server.latency_ms
+                if latency_ms:
+                    time.sleep(latency_ms / 1000)
+
+                prompt = "".join(m.get("content", "") for m in payload.get("messages", []))
+                books = _books_for(prompt)
+                # Structured output requests get the {"books": [...]} object their schema describes
+                content = json.dumps({"books": books} if payload.get("response_format") else books)
+
+                if payload.get("stream"):
+                    events = [
+                        f"data: {json.dumps({'choices': [{'delta': {'content': content[i:i + STREAM_PIECE_SIZE]}}]})}\n\n".encode()
+                        for i in range(0, len(content), STREAM_PIECE_SIZE)
+                    ] + [b"data: [DONE]\n\n"]
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    if server.drop_stream:
+                        self.send_header("Content-Length", str(sum(len(event) for event in events)))
+                        events = events[:len(events) // 2]
+                    self.end_headers()
+                    for event in events:
+                        self.wfile.write(event)
+                    self.close_connection = True
+                    return
+
+                body = json.dumps({
+                    "choices": [{"message": {"role": "assistant", "content": content}}]
+                }).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/api/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-llm", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenRouter stub")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    stub = StubLLMServer(port=args.port, latency_ms=args.latency_ms)
+    print(f"Stub LLM listening on {stub.url}")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
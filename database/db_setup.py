@@ -1,14 +1,126 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 from flask_migrate import Migrate
-import os 
+from sqlalchemy.engine import make_url
+from sqlalchemy.sql.dml import UpdateBase
+import os
 
+# Engine and pool settings, applied to the primary and the replica
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Seconds before a pooled connection is replaced (-1 = never)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+# Compiled SQL statements kept per engine
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# Optional read replica for read-only queries (history, search, auth lookups)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
 
-db = SQLAlchemy()
+# Full-text search over reading history, by database dialect
+SEARCH_BACKENDS = {"sqlite": "fts5", "postgresql": "tsvector"}
+
+_use_replica = ContextVar("use_replica", default=False)
+
+
+class RoutingSession(Session):
+
+    """Session that sends reads inside `read_replica()` to the replica engine
+
+    Flushes and INSERT/UPDATE/DELETE statements always go to the primary,
+    as does everything when no replica is configured.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if (_use_replica.get() and not self._flushing and not isinstance(clause, UpdateBase)
+                and "replica" in db.engines):
+            return db.engines["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 
+
+@contextmanager
+def read_replica():
+    """Run the enclosed read-only queries against the replica, if one is configured"""
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def search_backend_for(database_url):
+    """Return the full-text search backend for a database URL, or None if unsupported"""
+    if not database_url:
+        return None
+    return SEARCH_BACKENDS.get(make_url(database_url).get_backend_name())
+
+
+def engine_options(database_url) -> dict:
+
+    """Engine options for a database URL
+
+    Pool sizing only applies to pooled engines; in-memory SQLite keeps a
+    single shared connection and takes none of it.
+    """
+
+    options = {
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "query_cache_size": DB_STATEMENT_CACHE_SIZE,
+    }
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+
+    options.update({
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+    })
+    return options
+
+
+def pool_stats() -> dict:
+
+    """Connection pool usage of every engine, for /metrics"""
+
+    stats = {}
+    for name, engine in db.engines.items():
+        pool = engine.pool
+        if not hasattr(pool, "checkedout"):
+            continue
+        size = pool.size()
+        capacity = size + max(0, getattr(pool, "_max_overflow", 0))
+        checked_out = pool.checkedout()
+        stats[name or "primary"] = {
+            "size": size,
+            "checked_out": checked_out,
+            "checked_in": pool.checkedin(),
+            "overflow": pool.overflow(),
+            "utilisation": round(checked_out / capacity, 4) if capacity else 0.0,
+        }
+    return stats
+
+
 def init_db(app):
-    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
+    database_url = os.getenv("DATABASE_URL")
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_url
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if database_url:
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
+    if DATABASE_REPLICA_URL:
+        # A bind key with no models: only RoutingSession sends queries here
+        app.config["SQLALCHEMY_BINDS"] = {
+            "replica": {"url": DATABASE_REPLICA_URL, **engine_options(DATABASE_REPLICA_URL)}
+        }
+    # FTS5 on SQLite, a tsvector column with a GIN index on PostgreSQL (see migrations)
+    app.config["SEARCH_BACKEND"] = search_backend_for(database_url)
 
     db.init_app(app)
-    migrate.init_app(app, db)
\ No newline at end of file
+    migrate.init_app(app, db)
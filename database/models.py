@@ -29,6 +29,8 @@ class UserReadBook(db.Model):
 
     __table_args__ = (
         db.UniqueConstraint('user_id', 'isbn', name='unique_user_book'),
+        # Reading history is paged newest first by (read_at, id) within a user
+        db.Index('ix_user_read_books_user_read_at', 'user_id', 'read_at', 'id'),
     )
 
 
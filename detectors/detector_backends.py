@@ -0,0 +1,217 @@
+import os
+import ast
+import sys
+import argparse
+import cv2
+import numpy as np
+
+# "torch" runs the Ultralytics model, "onnx" runs an exported model with ONNX Runtime
+DETECTOR_BACKEND = os.getenv("DETECTOR_BACKEND", "torch").lower()
+SPINE_ONNX_PATH = os.getenv("SPINE_ONNX_PATH", "models/best.onnx")
+# 0 lets ONNX Runtime pick the number of intra-op threads
+ONNX_INTRA_OP_THREADS = int(os.getenv("ONNX_INTRA_OP_THREADS", "0"))
+
+# Ultralytics predict() defaults, so both backends keep the same boxes
+NMS_IOU_THRESHOLD = 0.7
+MAX_DETECTIONS = 300
+_CLASS_OFFSET = 7680
+
+
+def to_detections(result, confidence_threshold) -> list:
+
+    """Convert one Ultralytics result into the repo's detection dicts"""
+
+    detections = []
+
+    for box, conf in zip(result.boxes.xyxy.cpu().numpy(), result.boxes.conf.cpu().numpy()):
+        x1, y1, x2, y2 = box
+        if conf >= confidence_threshold:
+            detections.append({
+                "box": [int(x1), int(y1), int(x2), int(y2)],
+                "confidence": float(conf)
+            })
+
+    return detections
+
+
+class TorchSpineDetector:
+
+    """Ultralytics YOLO running in PyTorch"""
+
+    name = "torch"
+
+    def __init__(self, weights, device="cpu"):
+        from ultralytics import YOLO
+
+        if not os.path.exists(weights):
+            raise FileNotFoundError(f"YOLO model file ({weights}) not found")
+        self.weights = weights
+        self.model = YOLO(weights).to(device)
+
+    def detect(self, images, confidence_threshold) -> list:
+        results = self.model.predict(source=list(images), conf=confidence_threshold, verbose=False)
+        return [to_detections(r, confidence_threshold) for r in results]
+
+
+def _nms(boxes, scores, iou_threshold) -> list:
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    return keep
+
+
+class OnnxSpineDetector:
+
+    """YOLO exported to ONNX, run with ONNX Runtime on the CPU
+
+    Does not import torch. Decoding and class-aware NMS mirror Ultralytics
+    predict() so boxes match the PyTorch backend within rounding.
+    """
+
+    name = "onnx"
+
+    def __init__(self, onnx_path, intra_op_threads=ONNX_INTRA_OP_THREADS):
+        import onnxruntime as ort
+
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(
+                f"ONNX model file ({onnx_path}) not found. "
+                f"Export it with: python -m detectors.detector_backends export"
+            )
+        self.weights = onnx_path
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = intra_op_threads
+        self.session = ort.InferenceSession(onnx_path, sess_options=options, providers=["CPUExecutionProvider"])
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch, _, height, width = model_input.shape
+        self.input_size = (int(height), int(width))
+        # Models exported without dynamic axes only take one image per run
+        self.max_batch = batch if isinstance(batch, int) else None
+
+        names = self.session.get_modelmeta().custom_metadata_map.get("names")
+        self.num_classes = len(ast.literal_eval(names)) if names else None
+
+    def _prepare(self, image):
+        h, w = image.shape[:2]
+        scale = min(self.input_size[0] / h, self.input_size[1] / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        if (new_w, new_h) != (w, h):
+            image = cv2.resize(image, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+        # Centred letterbox, rounded the way Ultralytics' LetterBox does
+        top = int(round((self.input_size[0] - new_h) / 2 - 0.1))
+        left = int(round((self.input_size[1] - new_w) / 2 - 0.1))
+        padded = np.full((self.input_size[0], self.input_size[1], 3), 114, dtype=np.uint8)
+        padded[top:top + new_h, left:left + new_w] = image
+        # Ultralytics treats ndarray sources as BGR and flips them to RGB; do the same
+        tensor = padded[..., ::-1].transpose(2, 0, 1).astype(np.float32) / 255.0
+        return tensor, (scale, left, top, w, h)
+
+    def _decode(self, prediction, geometry, confidence_threshold) -> list:
+        scale, left, top, width, height = geometry
+        prediction = prediction.T
+        num_classes = self.num_classes or prediction.shape[1] - 4
+        class_scores = prediction[:, 4:4 + num_classes]
+        classes = class_scores.argmax(axis=1)
+        scores = class_scores[np.arange(len(classes)), classes]
+
+        mask = scores > confidence_threshold
+        if not mask.any():
+            return []
+        cx, cy, bw, bh = prediction[mask, :4].T
+        boxes = np.stack([cx - bw / 2, cy - bh / 2, cx + bw / 2, cy + bh / 2], axis=1)
+        scores, classes = scores[mask], classes[mask]
+
+        keep = _nms(boxes + (classes * _CLASS_OFFSET)[:, None], scores, NMS_IOU_THRESHOLD)[:MAX_DETECTIONS]
+
+        detections = []
+        for i in keep:
+            x1, y1, x2, y2 = np.clip((boxes[i] - [left, top, left, top]) / scale, 0, [width, height, width, height])
+            detections.append({
+                "box": [int(x1), int(y1), int(x2), int(y2)],
+                "confidence": float(scores[i])
+            })
+        return detections
+
+    def detect(self, images, confidence_threshold) -> list:
+        prepared = [self._prepare(image) for image in images]
+        step = self.max_batch or len(prepared) or 1
+        detections = []
+
+        for start in range(0, len(prepared), step):
+            chunk = prepared[start:start + step]
+            batch = np.stack([tensor for tensor, _ in chunk])
+            outputs = self.session.run(None, {self.input_name: batch})[0]
+            for prediction, (_, geometry) in zip(outputs, chunk):
+                detections.append(self._decode(prediction, geometry, confidence_threshold))
+
+        return detections
+
+
+def load_backend(name=DETECTOR_BACKEND, weights=None, device="cpu"):
+
+    """Create the configured spine detector backend"""
+
+    if name == "onnx":
+        return OnnxSpineDetector(weights or SPINE_ONNX_PATH)
+    if name == "torch":
+        from detectors.model_registry import SPINE_MODEL_PATH
+        return TorchSpineDetector(weights or SPINE_MODEL_PATH, device=device)
+    raise ValueError(f"Unknown detector backend: {name}")
+
+
+def export_onnx(weights, output=SPINE_ONNX_PATH, quantize=False, imgsz=640) -> str:
+
+    """Export YOLO weights to ONNX, optionally with INT8 dynamic quantisation
+
+    Returns the path of the written model. Needs ultralytics (and torch);
+    the exported model does not.
+    """
+
+    from ultralytics import YOLO
+
+    exported = YOLO(weights).export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        quantized = output + ".tmp"
+        quantize_dynamic(exported, quantized, weight_type=QuantType.QUInt8)
+        if os.path.abspath(exported) != os.path.abspath(output):
+            os.remove(exported)
+        os.replace(quantized, output)
+    elif os.path.abspath(exported) != os.path.abspath(output):
+        os.replace(exported, output)
+
+    return output
+
+
+if __name__ == "__main__":
+    # python -m detectors.detector_backends export [--weights models/best.pt] [--output models/best.onnx] [--quantize]
+    parser = argparse.ArgumentParser(description="Spine detector backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export the YOLO weights to ONNX")
+    export.add_argument("--weights", default=os.getenv("SPINE_MODEL_PATH", "models/best.pt"))
+    export.add_argument("--output", default=SPINE_ONNX_PATH)
+    export.add_argument("--quantize", action="store_true", help="Apply INT8 dynamic quantisation")
+    export.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    path = export_onnx(args.weights, args.output, quantize=args.quantize, imgsz=args.imgsz)
+    print(f"Wrote {path}")
+    sys.exit(0)
@@ -0,0 +1,284 @@
+import os
+import queue
+import threading
+import time
+import multiprocessing
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from utils.tracing import Histogram, register_collector
+
+# 0 disables the scheduler and keeps detection on the request thread
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "0"))
+INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", "8"))
+INFERENCE_MAX_WAIT_MS = float(os.getenv("INFERENCE_MAX_WAIT_MS", "20"))
+# Longest a request waits for its detections, queueing included, so a stuck worker cannot hold it forever
+INFERENCE_RESULT_TIMEOUT = float(os.getenv("INFERENCE_RESULT_TIMEOUT", "60"))
+
+
+batch_size_images = Histogram(
+    "bookfinder_inference_batch_size", "Images per batched spine detection call", (),
+    buckets=(1, 2, 4, 8, 16, 32, 64))
+queue_wait_seconds = Histogram(
+    "bookfinder_inference_queue_wait_seconds", "Time a detection request waited for its batch to start", ())
+
+
+def _init_worker():
+    """Load the YOLO model once in each worker process"""
+    from detectors.model_registry import get_spine_model
+    get_spine_model()
+
+
+def _predict_batch(images, confidence_thresholds):
+    from detectors.spine_detector import spine_detector_batch
+    return spine_detector_batch(images, confidence_thresholds=confidence_thresholds)
+
+
+class SpineInferenceScheduler:
+
+    """Micro-batch spine detection requests across concurrent callers
+
+    Requests are queued by `submit()`. A dispatcher thread takes the first
+    waiting image, keeps collecting until the batch is full or the oldest
+    request has waited `max_wait_ms`, then hands the batch to a process pool
+    whose workers each own one YOLO model. At most `workers` batches are in
+    flight at once; results are fanned back through per-request futures.
+    If a worker dies (OOM kill, segfault) the batches in flight fail and
+    the pool is replaced, so later requests are served again.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, max_batch_size=INFERENCE_MAX_BATCH_SIZE,
+                 max_wait_ms=INFERENCE_MAX_WAIT_MS):
+        self.workers = max(1, workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+
+        self._queue = queue.Queue()
+        self._slots = threading.Semaphore(self.workers)
+        self._metrics_lock = threading.Lock()
+        self._metrics = {
+            "requests": 0,
+            "batches": 0,
+            "batched_images": 0,
+            "failed_batches": 0,
+            "queue_wait_ms_total": 0.0,
+            "batch_latency_ms_total": 0.0,
+            "max_batch_size_seen": 0,
+            "pool_restarts": 0,
+            "in_flight_batches": 0,
+        }
+
+        self._pool_lock = threading.Lock()
+        self._pool = self._new_pool()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="spine-scheduler", daemon=True)
+        self._dispatcher.start()
+
+    def _new_pool(self):
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+
+    def _restart_pool(self, broken):
+
+        """Replace a pool broken by a dead worker; every failed batch reports
+        the same pool, so only the first caller restarts it"""
+
+        with self._pool_lock:
+            if self._pool is not broken:
+                return
+            print("Spine inference worker died; restarting the process pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+        with self._metrics_lock:
+            self._metrics["pool_restarts"] += 1
+
+    def submit(self, image, confidence_threshold=0.5) -> Future:
+        """Queue one preprocessed image; the future resolves to its detections"""
+        future = Future()
+        self._queue.put((image, confidence_threshold, future, time.perf_counter()))
+        with self._metrics_lock:
+            self._metrics["requests"] += 1
+        return future
+
+    def _collect_batch(self):
+        batch = [self._queue.get()]
+        deadline = batch[0][3] + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _dispatch_loop(self):
+        while True:
+            batch = self._collect_batch()
+            self._slots.acquire()
+
+            started = time.perf_counter()
+            with self._metrics_lock:
+                self._metrics["batches"] += 1
+                self._metrics["batched_images"] += len(batch)
+                self._metrics["max_batch_size_seen"] = max(self._metrics["max_batch_size_seen"], len(batch))
+                self._metrics["queue_wait_ms_total"] += sum((started - item[3]) * 1000 for item in batch)
+                self._metrics["in_flight_batches"] += 1
+            batch_size_images.observe((), len(batch))
+            for item in batch:
+                queue_wait_seconds.observe((), started - item[3])
+
+            images = [item[0] for item in batch]
+            thresholds = [item[1] for item in batch]
+            pool = self._pool
+            try:
+                pool_future = pool.submit(_predict_batch, images, thresholds)
+            except BrokenProcessPool:
+                # Broken since the last batch finished; retry once on a fresh pool
+                self._restart_pool(pool)
+                pool = self._pool
+                try:
+                    pool_future = pool.submit(_predict_batch, images, thresholds)
+                except Exception as e:
+                    self._finish(batch, started, error=e)
+                    continue
+            except Exception as e:
+                self._finish(batch, started, error=e)
+                continue
+            pool_future.add_done_callback(
+                lambda f, pool=pool, batch=batch, started=started: self._on_done(f, pool, batch, started))
+
+    def _on_done(self, pool_future, pool, batch, started):
+        try:
+            results = pool_future.result()
+        except BrokenProcessPool as e:
+            # The batch may be what killed the worker, so it fails rather than being retried
+            self._restart_pool(pool)
+            self._finish(batch, started, error=e)
+            return
+        except (Exception, CancelledError) as e:
+            self._finish(batch, started, error=e)
+            return
+        self._finish(batch, started, results=results)
+
+    def _finish(self, batch, started, results=None, error=None):
+        self._slots.release()
+        with self._metrics_lock:
+            self._metrics["batch_latency_ms_total"] += (time.perf_counter() - started) * 1000
+            self._metrics["in_flight_batches"] -= 1
+            if error is not None:
+                self._metrics["failed_batches"] += 1
+
+        for i, item in enumerate(batch):
+            future = item[2]
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+    def metrics(self) -> dict:
+        with self._metrics_lock:
+            m = dict(self._metrics)
+
+        batches = m["batches"] or 1
+        images = m["batched_images"] or 1
+        return {
+            "workers": self.workers,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": self._queue.qsize(),
+            "requests": m["requests"],
+            "batches": m["batches"],
+            "failed_batches": m["failed_batches"],
+            "pool_restarts": m["pool_restarts"],
+            "in_flight_batches": m["in_flight_batches"],
+            "max_batch_size_seen": m["max_batch_size_seen"],
+            "avg_batch_size": round(m["batched_images"] / batches, 2),
+            "avg_queue_wait_ms": round(m["queue_wait_ms_total"] / images, 2),
+            "avg_batch_latency_ms": round(m["batch_latency_ms_total"] / batches, 2),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    # Spawned workers re-import the app module; they must never start their own pool
+    return INFERENCE_WORKERS > 0 and multiprocessing.parent_process() is None
+
+
+def get_scheduler() -> SpineInferenceScheduler:
+
+    """Return the process-wide scheduler, starting it on first use"""
+
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = SpineInferenceScheduler()
+    return _scheduler
+
+
+def init_scheduler(app=None):
+    """Start the scheduler at create_app() time when it is enabled"""
+    if is_enabled():
+        get_scheduler()
+
+
+def submit(image, confidence_threshold=0.5) -> Future:
+    return get_scheduler().submit(image, confidence_threshold)
+
+
+def wait_for(futures, timeout=INFERENCE_RESULT_TIMEOUT) -> list:
+
+    """Return the detections of submitted futures, in order
+
+    Raises TimeoutError if they are not all done within `timeout` seconds.
+    """
+
+    _, not_done = wait(futures, timeout=timeout)
+    if not_done:
+        raise TimeoutError(f"Spine detection did not finish within {timeout:g}s")
+    return [future.result() for future in futures]
+
+
+def scheduler_metrics() -> dict:
+    if not is_enabled():
+        return {"enabled": False}
+    if _scheduler is None:
+        return {"enabled": True, "started": False}
+    return {"enabled": True, "started": True, **_scheduler.metrics()}
+
+
+# Prometheus name, type, help text and metrics() key of each exported figure
+_PROMETHEUS_METRICS = (
+    ("bookfinder_inference_queue_depth", "gauge", "Detection requests waiting for a batch", "queue_depth"),
+    ("bookfinder_inference_in_flight_batches", "gauge", "Batches running in the worker pool", "in_flight_batches"),
+    ("bookfinder_inference_workers", "gauge", "Inference worker processes", "workers"),
+    ("bookfinder_inference_requests_total", "counter", "Detection requests submitted", "requests"),
+    ("bookfinder_inference_batches_total", "counter", "Batched detection calls started", "batches"),
+    ("bookfinder_inference_failed_batches_total", "counter", "Batched detection calls that failed", "failed_batches"),
+    ("bookfinder_inference_pool_restarts_total", "counter", "Worker pools replaced after a worker died", "pool_restarts"),
+)
+
+
+def render_scheduler_metrics() -> list:
+    """Scheduler gauges, counters and histograms for /metrics, once the scheduler is running"""
+    if _scheduler is None:
+        return []
+    m = _scheduler.metrics()
+    lines = []
+    for name, kind, help_text, key in _PROMETHEUS_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {m[key]}"]
+    return lines + batch_size_images.render() + queue_wait_seconds.render()
+
+
+register_collector(render_scheduler_metrics)
@@ -0,0 +1,149 @@
+import os
+import threading
+import multiprocessing
+import time
+
+SPINE_MODEL_PATH = os.getenv("SPINE_MODEL_PATH", "models/best.pt")
+MODEL_DEVICE = os.getenv("MODEL_DEVICE", "cpu")
+OCR_LANGUAGES = os.getenv("OCR_LANGUAGES", "en").split(",")
+
+# "eager" loads every model inside create_app(), "lazy" defers each one to first use
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "eager").lower()
+
+_lock = threading.Lock()
+_models = {}
+_stats = {}
+
+
+def _resident_memory_mb():
+
+    """Return the resident set size of the current process in MB"""
+
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        import resource
+        # ru_maxrss is reported in KB on Linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _load_spine_model():
+    # The backend module is imported here so the ONNX backend never pulls in torch
+    from detectors.detector_backends import load_backend, DETECTOR_BACKEND
+
+    return load_backend(DETECTOR_BACKEND, device=MODEL_DEVICE)
+
+
+def _load_ocr_reader():
+    import easyocr
+
+    return easyocr.Reader(OCR_LANGUAGES, gpu=MODEL_DEVICE != "cpu")
+
+
+_LOADERS = {
+    "spine_detector": _load_spine_model,
+    "ocr_reader": _load_ocr_reader,
+}
+
+
+def _get(name):
+
+    """Return the named model, loading it once per process on first access"""
+
+    model = _models.get(name)
+    if model is not None:
+        return model
+
+    with _lock:
+        if name in _models:
+            return _models[name]
+
+        rss_before = _resident_memory_mb()
+        start = time.perf_counter()
+        model = _LOADERS[name]()
+        load_seconds = time.perf_counter() - start
+        rss_after = _resident_memory_mb()
+
+        _models[name] = model
+        _stats[name] = {
+            "load_seconds": round(load_seconds, 3),
+            "rss_delta_mb": round(rss_after - rss_before, 1),
+            "loaded_at": time.time(),
+        }
+        print(f"Loaded {name} in {load_seconds:.2f}s (+{rss_after - rss_before:.1f}MB RSS)")
+        return model
+
+
+def get_spine_model():
+    """Return the shared YOLO spine detection model"""
+    return _get("spine_detector")
+
+
+def get_ocr_reader():
+    """Return the shared EasyOCR reader"""
+    return _get("ocr_reader")
+
+
+def model_version() -> str:
+
+    """Identify the deployed spine model weights
+
+    Uses SPINE_MODEL_VERSION when set, otherwise the backend plus the
+    weight file's name, size and modification time, so switching backend or
+    replacing the weights changes the value.
+    """
+
+    version = os.getenv("SPINE_MODEL_VERSION")
+    if version:
+        return version
+
+    from detectors.detector_backends import DETECTOR_BACKEND, SPINE_ONNX_PATH
+    path = SPINE_ONNX_PATH if DETECTOR_BACKEND == "onnx" else SPINE_MODEL_PATH
+    try:
+        st = os.stat(path)
+        return f"{DETECTOR_BACKEND}:{os.path.basename(path)}:{st.st_size}:{int(st.st_mtime)}"
+    except OSError:
+        return f"{DETECTOR_BACKEND}:{os.path.basename(path)}"
+
+
+def init_models(app=None):
+
+    """Load all models up front unless lazy loading is configured
+
+    Called from create_app() so the cost is paid once per worker rather
+    than once per request. When the inference scheduler is enabled YOLO is
+    left to its worker processes, and the EasyOCR reader is only preloaded
+    when EasyOCR is the configured OCR backend. Load failures are reported but do not stop the
+    app from starting; the failing model is retried on first use.
+    """
+
+    if MODEL_LOAD_MODE == "lazy" or multiprocessing.parent_process() is not None:
+        # Helper processes (e.g. inference workers) load only what they use
+        return
+
+    from detectors import inference_scheduler
+    from detectors.ocr_backends import OCR_BACKEND
+    for name in _LOADERS:
+        if name == "spine_detector" and inference_scheduler.is_enabled():
+            # The inference workers own the YOLO model
+            continue
+        if name == "ocr_reader" and OCR_BACKEND != "easyocr":
+            # EasyOCR imports torch; requests that ask for it still load it on first use
+            continue
+        try:
+            _get(name)
+        except Exception as e:
+            print(f"Failed to preload {name}: {e}")
+
+
+def model_stats() -> dict:
+
+    """Return load time and memory figures for every loaded model"""
+
+    return {
+        "mode": MODEL_LOAD_MODE,
+        "loaded": sorted(_models),
+        "models": dict(_stats),
+        "rss_mb": round(_resident_memory_mb(), 1),
+    }
@@ -0,0 +1,125 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+
+# "easyocr" (default, most accurate) or "tesseract" (cheaper, for high-volume traffic)
+OCR_BACKEND = os.getenv("OCR_BACKEND", "easyocr").lower()
+# Tesseract shells out once per crop, so crops are spread over a process pool
+TESSERACT_WORKERS = int(os.getenv("TESSERACT_WORKERS", str(os.cpu_count() or 2)))
+# --psm 6: treat each crop as a single block of text
+TESSERACT_CONFIG = os.getenv("TESSERACT_CONFIG", "--psm 6")
+TESSERACT_LANGUAGES = os.getenv("TESSERACT_LANGUAGES", "eng")
+
+OCR_BACKENDS = ("easyocr", "tesseract")
+
+_lock = threading.Lock()
+_backends = {}
+
+
+class EasyOcrBackend:
+
+    """The shared EasyOCR reader, reading all crops of a shelf as one batch"""
+
+    name = "easyocr"
+
+    def read(self, crops) -> list:
+        from detectors.ocr_engine import read_crops
+        return read_crops(crops)
+
+
+def _tesseract_read(crop, config, languages) -> list:
+
+    """Read one crop with Tesseract, returning `[(line_text, conf), ...]`
+
+    Runs in a pool worker. Word confidences (0-100) are averaged per line
+    and scaled to 0-1 so they compare with EasyOCR's.
+    """
+
+    import pytesseract
+
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+
+    data = pytesseract.image_to_data(crop, lang=languages, config=config, output_type=pytesseract.Output.DICT)
+
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if not word.strip() or conf < 0:
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append((word.strip(), conf))
+
+    return [
+        (" ".join(w for w, _ in words), sum(c for _, c in words) / len(words) / 100)
+        for words in lines.values()
+    ]
+
+
+class TesseractBackend:
+
+    """Tesseract via pytesseract, one crop per pool task
+
+    pytesseract runs the tesseract binary for every call, so crops are
+    read in parallel by a process pool created on first use.
+    """
+
+    name = "tesseract"
+
+    def __init__(self, workers=TESSERACT_WORKERS, config=TESSERACT_CONFIG, languages=TESSERACT_LANGUAGES):
+        self.workers = max(1, workers)
+        self.config = config
+        self.languages = languages
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def read(self, crops) -> list:
+        outputs = [[] for _ in crops]
+        indices = [i for i, crop in enumerate(crops) if crop is not None and crop.size > 0]
+        if not indices:
+            return outputs
+
+        pool = self._get_pool()
+        futures = {i: pool.submit(_tesseract_read, crops[i], self.config, self.languages) for i in indices}
+        for i, future in futures.items():
+            try:
+                outputs[i] = future.result()
+            except Exception as e:
+                print(f"Error processing crop: {e}")
+
+        return outputs
+
+    def shutdown(self):
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+
+def get_ocr_backend(name=None):
+
+    """Return the shared OCR backend `name`, or the configured OCR_BACKEND"""
+
+    name = (name or OCR_BACKEND).lower()
+    if name not in OCR_BACKENDS:
+        raise ValueError(f"Unknown OCR backend: {name}. Choose one of: {', '.join(OCR_BACKENDS)}")
+
+    backend = _backends.get(name)
+    if backend is None:
+        with _lock:
+            backend = _backends.get(name)
+            if backend is None:
+                backend = EasyOcrBackend() if name == "easyocr" else TesseractBackend()
+                _backends[name] = backend
+    return backend
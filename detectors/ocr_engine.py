@@ -0,0 +1,80 @@
+import os
+import cv2
+import numpy as np
+from detectors.model_registry import get_ocr_reader
+
+# All crops of a shelf are resized to their median height, capped at
+# OCR_BATCH_HEIGHT, and padded to a shared width
+OCR_BATCH_HEIGHT = int(os.getenv("OCR_BATCH_HEIGHT", "128"))
+OCR_BATCH_MIN_HEIGHT = 32
+OCR_BATCH_MAX_WIDTH = int(os.getenv("OCR_BATCH_MAX_WIDTH", "2048"))
+OCR_BATCH_SIZE = int(os.getenv("OCR_BATCH_SIZE", "16"))
+
+
+def normalise_crops(crops, target_height=None, max_width=OCR_BATCH_MAX_WIDTH):
+
+    """Resize crops to a common height and right-pad them to a common width
+
+    Returns the normalised crops together with the shared (width, height).
+    By default the height is the median crop height clamped to
+    [OCR_BATCH_MIN_HEIGHT, OCR_BATCH_HEIGHT], so full-resolution crops are
+    not shrunk more than needed. Aspect ratio is kept; crops wider than
+    `max_width` after scaling are squeezed to fit.
+    """
+
+    if target_height is None:
+        median = int(np.median([crop.shape[0] for crop in crops]))
+        target_height = min(max(median, OCR_BATCH_MIN_HEIGHT), OCR_BATCH_HEIGHT)
+
+    resized = []
+    for crop in crops:
+        # Rotated crops arrive as np.rot90 views; OpenCV needs contiguous memory
+        crop = np.ascontiguousarray(crop)
+        h, w = crop.shape[:2]
+        new_w = max(1, min(max_width, int(round(w * target_height / h))))
+        resized.append(cv2.resize(crop, (new_w, target_height), interpolation=cv2.INTER_LINEAR))
+
+    batch_width = max(img.shape[1] for img in resized)
+    normalised = [
+        cv2.copyMakeBorder(img, 0, 0, 0, batch_width - img.shape[1], cv2.BORDER_REPLICATE)
+        for img in resized
+    ]
+    return normalised, (batch_width, target_height)
+
+
+def _to_texts(result) -> list:
+    return [(text, conf) for (_, text, conf) in result]
+
+
+def read_crops(crops, reader=None, batch_size=OCR_BATCH_SIZE) -> list:
+
+    """Run OCR over every spine crop of a shelf image in batches
+
+    Returns one `[(text, conf), ...]` list per input crop, in order. Empty
+    crops yield an empty list. If the batched call fails the crops are read
+    one at a time instead so a single bad crop does not lose the shelf.
+    """
+
+    if reader is None:
+        reader = get_ocr_reader()
+
+    outputs = [[] for _ in crops]
+    indices = [i for i, crop in enumerate(crops) if crop is not None and crop.size > 0]
+    if not indices:
+        return outputs
+
+    batch, (n_width, n_height) = normalise_crops([crops[i] for i in indices])
+
+    try:
+        results = reader.readtext_batched(batch, n_width=n_width, n_height=n_height, batch_size=batch_size)
+        for i, result in zip(indices, results):
+            outputs[i] = _to_texts(result)
+    except Exception as e:
+        print(f"Batched OCR failed, reading crops individually: {e}")
+        for i in indices:
+            try:
+                outputs[i] = _to_texts(reader.readtext(np.ascontiguousarray(crops[i])))
+            except Exception as e:
+                print(f"Error processing crop: {e}")
+
+    return outputs
@@ -1,26 +1,57 @@
-from ultralytics import YOLO
+from detectors.model_registry import get_spine_model
+from detectors.detector_backends import to_detections
 
 
-def spine_detector(image, model, confidence_threshold=0.5, device="cpu") -> list:
+def spine_detector_batch(images, model=None, confidence_thresholds=0.5) -> list:
+
+    """Detect spines on several images with a single batched predict call
+
+    `confidence_thresholds` is either one threshold for every image or a
+    list with one threshold per image. Returns one detection list per image.
+    """
+
+    if model is None:
+        model = get_spine_model()
+
+    if not isinstance(confidence_thresholds, (list, tuple)):
+        confidence_thresholds = [confidence_thresholds] * len(images)
+
+    if hasattr(model, "detect"):
+        results = model.detect(list(images), min(confidence_thresholds))
+        return [
+            [d for d in detections if d["confidence"] >= threshold]
+            for detections, threshold in zip(results, confidence_thresholds)
+        ]
+
+    results = model.predict(source=list(images), conf=min(confidence_thresholds), verbose=False)
+
+    return [to_detections(r, threshold) for r, threshold in zip(results, confidence_thresholds)]
+
+
+def spine_detector(image, model=None, confidence_threshold=0.5, device="cpu") -> list:
 
     """Detect spines of the given image using the provided model
 
     This function no longer imports `model` from `app` to avoid a circular
-    import. The caller must pass the initialized model instance.
+    import. When no model is passed the image is sent to the inference
+    scheduler if it is enabled, otherwise the process-wide detector backend
+    from the model registry is used. A raw Ultralytics model can still be
+    passed in directly.
     """
 
+    if model is None:
+        from detectors import inference_scheduler
+        if inference_scheduler.is_enabled():
+            return inference_scheduler.wait_for([inference_scheduler.submit(image, confidence_threshold)])[0]
+        model = get_spine_model()
+
+    if hasattr(model, "detect"):
+        return model.detect([image], confidence_threshold)[0]
+
     results = model.predict(source=image, conf=confidence_threshold, verbose=False)
     detections = []
 
     for r in results:
-         
-        for box, conf in zip(r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy()):
-            x1, y1, x2, y2 = box
-            if conf >= confidence_threshold:
-                detections.append({
-                    "box": [int(x1), int(y1), int(x2), int(y2)],
-                    "confidence": float(conf)
-                })
-                
-
-    return detections
\ No newline at end of file
+        detections.extend(to_detections(r, confidence_threshold))
+
+    return detections
@@ -0,0 +1,98 @@
+import os
+import cv2
+import numpy as np
+
+# A spine whose best reading is below this mean confidence is re-read at the other rotations
+ORIENTATION_MIN_CONFIDENCE = float(os.getenv("ORIENTATION_MIN_CONFIDENCE", "0.4"))
+# Crops at least this much taller than wide are treated as vertical spines
+VERTICAL_ASPECT_RATIO = 1.2
+# The probe only overrides the aspect ratio when one direction clearly wins
+PROBE_MARGIN = 1.3
+PROBE_SIDE = 96
+
+# Counter-clockwise degrees, as PIL's rotate() used to apply them
+ROTATIONS = (0, 90, 270)
+
+
+def rotate_crop(crop, degrees):
+    """Rotate a crop counter-clockwise by a multiple of 90 degrees (a view, no copy)"""
+    return np.rot90(crop, k=(degrees // 90) % 4)
+
+
+def probe_text_direction(crop):
+
+    """Guess whether text lines in the crop run horizontally or vertically
+
+    Counts ink/background transitions along rows and along columns of a
+    small binarised copy: a scanline along a line of text crosses many
+    strokes, one across it crosses few. Returns "horizontal", "vertical"
+    or None when the two are too close to call.
+    """
+
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    h, w = gray.shape[:2]
+    scale = PROBE_SIDE / max(h, w)
+    if scale < 1:
+        gray = cv2.resize(gray, (max(1, int(w * scale)), max(1, int(h * scale))), interpolation=cv2.INTER_AREA)
+
+    _, ink = cv2.threshold(gray, 0, 1, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    along_rows = np.count_nonzero(np.diff(ink, axis=1)) / max(1, ink.shape[0])
+    along_cols = np.count_nonzero(np.diff(ink, axis=0)) / max(1, ink.shape[1])
+
+    if along_rows > along_cols * PROBE_MARGIN:
+        return "horizontal"
+    if along_cols > along_rows * PROBE_MARGIN:
+        return "vertical"
+    return None
+
+
+def candidate_rotations(crop) -> list:
+
+    """Rotations to try for a crop, most likely first
+
+    Vertical text is tried at 90 then 270 degrees, horizontal text at 0.
+    The probe decides the direction; the box aspect ratio breaks ties.
+    """
+
+    h, w = crop.shape[:2]
+    direction = probe_text_direction(crop)
+    if direction is None:
+        direction = "vertical" if h >= w * VERTICAL_ASPECT_RATIO else "horizontal"
+
+    first = (90, 270) if direction == "vertical" else (0,)
+    return list(first) + [r for r in ROTATIONS if r not in first]
+
+
+def _mean_confidence(texts) -> float:
+    return sum(conf for _, conf in texts) / len(texts) if texts else 0.0
+
+
+def read_oriented(crops, read, min_confidence=ORIENTATION_MIN_CONFIDENCE):
+
+    """OCR every crop at its most likely rotation, retrying weak reads
+
+    `read(crops)` is an OCR backend's read and returns `[(text, conf), ...]`
+    per crop. Each pass reads, as one batch, only the crops still below
+    `min_confidence` at their next candidate rotation; the best reading is
+    kept. Returns the per-crop texts and the rotation used for each.
+    """
+
+    candidates = [candidate_rotations(crop) if crop.size else [0] for crop in crops]
+    outputs = [[] for _ in crops]
+    scores = [-1.0] * len(crops)
+    rotations = [c[0] for c in candidates]
+
+    pending = list(range(len(crops)))
+    attempt = 0
+    while pending:
+        texts = read([rotate_crop(crops[i], candidates[i][attempt]) for i in pending])
+        for i, result in zip(pending, texts):
+            score = _mean_confidence(result)
+            if score > scores[i]:
+                outputs[i], scores[i], rotations[i] = result, score, candidates[i][attempt]
+
+        attempt += 1
+        pending = [i for i in pending
+                   if scores[i] < min_confidence and attempt < len(candidates[i]) and crops[i].size]
+
+    return outputs, rotations
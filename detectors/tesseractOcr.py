@@ -30,10 +30,12 @@ def text_from_image(image:Image.Image)->str:
     
     return " ".join(text.split())
 
-# image2 = resize_image('detected_spines/spine_1.png')
-image2 = Image.open('detected_spines/spine_5.png')
-
-rotated_img = image2.rotate(90, expand=True)
-rotated_img.save("rotated_image.png")
-text2 = text_from_image(Image.open('rotated_image.png'))
-print(text2)
\ No newline at end of file
+if __name__ == "__main__":
+    # The pipeline reads spines through detectors.ocr_backends; this is a manual check
+    # image2 = resize_image('detected_spines/spine_1.png')
+    image2 = Image.open('detected_spines/spine_5.png')
+
+    rotated_img = image2.rotate(90, expand=True)
+    rotated_img.save("rotated_image.png")
+    text2 = text_from_image(Image.open('rotated_image.png'))
+    print(text2)
@@ -113,14 +113,19 @@
 import os
 import json
 import re
-import requests
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+from services.result_cache import ResultCache
+from identifier.catalogue import get_catalogue
+from identifier.llm_client import LLMClient, CircuitBreaker, CircuitOpenError
+from identifier.json_stream import BookStreamParser, BOOKS_RESPONSE_FORMAT
 
 load_dotenv()
 
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
 
-OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
+OPENROUTER_URL = os.getenv("OPENROUTER_URL", "https://openrouter.ai/api/v1/chat/completions")
 
 HEADERS = {
     "Authorization": f"Bearer {OPENROUTER_API_KEY}",
@@ -129,21 +134,178 @@ HEADERS = {
     "X-Title": "Book-Finder",
 }
 
-
-def identify(ocr_predictions):
-    """
-    Identify books based on OCR predictions from book spines.
-    Returns a Python list of dicts, ready for jsonify().
+# Shared OpenRouter client: keep-alive pool, retries, circuit breaker and hedging
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "30"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "8"))
+# Longest Retry-After honoured before retrying anyway
+LLM_RETRY_AFTER_MAX = float(os.getenv("LLM_RETRY_AFTER_MAX", "60"))
+# Seconds before a slow call gets a duplicate request (0 disables hedging)
+LLM_HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER", "10"))
+# Consecutive failed calls before model calls pause, and for how many seconds
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.getenv("LLM_BREAKER_COOLDOWN", "30"))
+
+llm_client = LLMClient(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    max_retries=LLM_MAX_RETRIES,
+    backoff_base=LLM_BACKOFF_BASE,
+    backoff_max=LLM_BACKOFF_MAX,
+    retry_after_max=LLM_RETRY_AFTER_MAX,
+    hedge_after=LLM_HEDGE_AFTER,
+    breaker=CircuitBreaker(threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN),
+)
+
+# Ask for JSON matching the book schema, and stream the reply so books are parsed as they arrive
+LLM_STRUCTURED_OUTPUT = os.getenv("LLM_STRUCTURED_OUTPUT", "1").lower() in ("1", "true", "yes")
+LLM_STREAM = os.getenv("LLM_STREAM", "1").lower() in ("1", "true", "yes")
+
+# Large shelves are split into chunks of spines identified by concurrent calls
+LLM_CHUNK_SIZE = int(os.getenv("LLM_CHUNK_SIZE", "8"))
+LLM_CHUNK_CONCURRENCY = int(os.getenv("LLM_CHUNK_CONCURRENCY", "4"))
+# max_tokens for a chunk: a fixed allowance plus this many per spine, capped
+LLM_TOKENS_PER_SPINE = int(os.getenv("LLM_TOKENS_PER_SPINE", "120"))
+LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "4096"))
+LLM_BASE_TOKENS = 64
+
+_chunk_slots = threading.BoundedSemaphore(max(1, LLM_CHUNK_CONCURRENCY))
+
+# Per-spine identification cache, keyed on normalised OCR text
+SPINE_CACHE_SIZE = int(os.getenv("SPINE_CACHE_SIZE", "4096"))
+SPINE_CACHE_TTL = float(os.getenv("SPINE_CACHE_TTL", str(7 * 24 * 60 * 60)))
+SPINE_CACHE_DB = os.getenv("SPINE_CACHE_DB", "")
+# Tokens shorter than this are treated as OCR noise when bucketing spines
+SPINE_MIN_TOKEN_LENGTH = 3
+
+spine_cache = ResultCache(max_entries=SPINE_CACHE_SIZE, ttl=SPINE_CACHE_TTL, db_path=SPINE_CACHE_DB)
+
+_stats_lock = threading.Lock()
+_stats = {"spine_hits": 0, "spine_misses": 0, "catalogue_hits": 0, "llm_calls": 0, "rejected_books": 0}
+
+
+def spine_text(texts) -> str:
+    """Join the OCR fragments of one spine into a single string"""
+    return " ".join(str(t[0]) if isinstance(t, (list, tuple)) else str(t) for t in texts)
+
+
+def normalise_spine_text(text: str) -> str:
+
+    """Reduce spine OCR text to a fuzzy bucket key
+
+    Text is case-folded, punctuation is dropped, whitespace is collapsed and
+    the remaining tokens are de-duplicated and sorted, so reads that differ
+    only in case, spacing, token order or stray short fragments share a key.
     """
 
-    prompt = f"""
-You are given OCR predictions extracted from book spines:
+    tokens = re.sub(r"[^\w\s]", " ", text.casefold()).split()
+    tokens = sorted({t for t in tokens if len(t) >= SPINE_MIN_TOKEN_LENGTH})
+    return " ".join(tokens)
+
 
-OCR: {ocr_predictions}
+def identifier_stats() -> dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["cache"] = spine_cache.stats()
+    stats["llm_client"] = llm_client.stats()
+    return stats
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def extract_json(s: str):
+    """Extract JSON from text with multiple fallback strategies"""
+    if not s:
+        return None
+
+    # Strategy 1: Try direct JSON parsing
+    try:
+        return json.loads(s.strip())
+    except:
+        pass
+
+    # Strategy 2: Remove markdown code blocks
+    cleaned = re.sub(r"```json\s*|```\s*", "", s, flags=re.IGNORECASE)
+    cleaned = cleaned.strip()
+    
+    try:
+        return json.loads(cleaned)
+    except:
+        pass
+
+    # Strategy 3: Find JSON object/array boundaries
+    start_match = re.search(r"[\[{]", cleaned)
+    if start_match:
+        start = start_match.start()
+        open_char = cleaned[start]
+        close_char = "]" if open_char == "[" else "}"
+        
+        # Find matching closing bracket
+        depth = 0
+        end = -1
+        for i in range(start, len(cleaned)):
+            if cleaned[i] == open_char:
+                depth += 1
+            elif cleaned[i] == close_char:
+                depth -= 1
+                if depth == 0:
+                    end = i
+                    break
+        
+        if end > start:
+            candidate = cleaned[start:end + 1]
+            try:
+                return json.loads(candidate)
+            except:
+                pass
+
+    # Strategy 4: Try to fix common JSON issues
+    # Remove leading/trailing text
+    json_match = re.search(r'(\[.*\]|\{.*\})', cleaned, re.DOTALL)
+    if json_match:
+        candidate = json_match.group(1)
+        try:
+            return json.loads(candidate)
+        except:
+            # Try fixing common issues
+            # Fix single quotes to double quotes
+            fixed = re.sub(r"'([^']*)':", r'"\1":', candidate)
+            fixed = re.sub(r":\s*'([^']*)'", r': "\1"', fixed)
+            try:
+                return json.loads(fixed)
+            except:
+                pass
+
+    return None
+
+
+def _build_prompt(spines) -> str:
+    ocr = json.dumps([{"spine": i, "ocr": text} for i, text in spines], ensure_ascii=False)
+    example = '{"spine": 0, "title": "Book Title", "ISBN": "1234567890", "author": "Author Name", "description": "Book description"}'
+
+    # Structured output wraps the array in {"books": [...]}, as the response schema requires
+    if LLM_STRUCTURED_OUTPUT:
+        shape = 'Respond with a JSON object whose "books" key holds the array'
+        empty = '{"books": []}'
+        example = f'{{"books": [{example}]}}'
+    else:
+        shape = "Start your response with [ and end with ]"
+        empty = "[]"
+        example = f"[{example}]"
+
+    return f"""
+You are given OCR predictions extracted from book spines. Each entry has a "spine" number and the OCR text read from that spine:
+
+OCR: {ocr}
 
 Your task:
 1. Infer the correct book titles and authors from the OCR text.
 2. For each book detected, return a JSON array with objects containing:
+   - "spine" (integer): The spine number the book was read from
    - "title" (string): The book title
    - "ISBN" (string): ISBN if found, otherwise "N/A"
    - "author" (string): The author name
@@ -151,32 +313,108 @@ Your task:
 
 CRITICAL OUTPUT REQUIREMENTS:
 - You MUST respond with ONLY valid JSON, no other text.
-- Start your response with [ and end with ]
+- {shape}
 - Do NOT use markdown code blocks (no ```json or ```)
 - Do NOT include any explanatory text before or after the JSON
 - Use double quotes for all strings
-- If no books are found, return an empty array: []
-- Example format: [{{"title": "Book Title", "ISBN": "1234567890", "author": "Author Name", "description": "Book description"}}]
+- If no books are found, return an empty array: {empty}
+- Example format: {example}
 
 Now return the JSON array:
 """
 
+
+def _content_pieces(response):
+
+    """Yield the model's reply text as it arrives
+
+    Streamed (Server-Sent Events) replies yield each delta; plain JSON
+    replies yield the whole message at once.
+    """
+
+    if "text/event-stream" not in response.headers.get("Content-Type", ""):
+        yield response.json()["choices"][0]["message"]["content"]
+        return
+
+    for line in response.iter_lines(decode_unicode=True):
+        # Blank lines separate events; lines starting with ":" are keep-alive comments
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)["choices"][0].get("delta", {}).get("content") or ""
+
+
+def _unstructured_fallback(text_output):
+
+    """Parse a reply that did not contain a JSON list of books, the way
+    identify() always has"""
+
+    parsed = extract_json(text_output)
+
+    if parsed is None:
+        # Try to extract any useful information even if JSON parsing fails
+        # Look for title and author patterns in the text
+        fallback_result = []
+        title_match = re.search(r'(?:title|book)[\s:]+["\']?([^"\'\n]+)["\']?', text_output, re.IGNORECASE)
+        author_match = re.search(r'(?:author|by)[\s:]+["\']?([^"\'\n]+)["\']?', text_output, re.IGNORECASE)
+        
+        if title_match or author_match:
+            fallback_result.append({
+                "title": title_match.group(1) if title_match else "Unknown",
+                "author": author_match.group(1) if author_match else "Unknown",
+                "ISBN": "N/A",
+                "description": "Parsed from unstructured model output"
+            })
+            return fallback_result
+        
+        return {
+            "error": "could_not_parse_model_output",
+            "message": "The model returned text that could not be parsed as JSON. This might be due to the model's response format.",
+            "raw_text": text_output[:500],  # Limit to first 500 chars
+            "suggestion": "Try again or check the OCR input quality"
+        }
+
+    if isinstance(parsed, dict):
+        return [parsed]
+    elif isinstance(parsed, list):
+        return parsed
+    else:
+        return []
+
+
+def _call_model(prompt, max_tokens=512, on_book=None):
+
+    """Send one prompt to OpenRouter and return the parsed list of books,
+    or an error dict in the same shape identify() has always returned
+
+    The reply is parsed in one pass as it streams in; `on_book(book)` is
+    called for every valid book as soon as it is complete. Books parsed
+    before a truncated reply are still returned.
+    """
+
     payload = {
         "model": "openai/gpt-4o",   # or llama-3 for cheaper usage
-        "max_tokens": 512,
+        "max_tokens": max_tokens,
         "temperature": 0.3,
         "messages": [
             {"role": "user", "content": prompt}
         ]
     }
+    if LLM_STRUCTURED_OUTPUT:
+        payload["response_format"] = BOOKS_RESPONSE_FORMAT
+    if LLM_STREAM:
+        payload["stream"] = True
 
+    _count("llm_calls")
     try:
-        response = requests.post(
-            OPENROUTER_URL,
-            headers=HEADERS,
-            json=payload,
-            timeout=30
-        )
+        response = llm_client.post(OPENROUTER_URL, payload, headers=HEADERS, timeout=LLM_TIMEOUT, stream=LLM_STREAM)
+    except CircuitOpenError as e:
+        return {
+            "error": "model_unavailable",
+            "message": str(e)
+        }
     except Exception as e:
         return {
             "error": "network_error",
@@ -191,6 +429,9 @@ Now return the JSON array:
             err = response.json()
         except:
             err = response.text
+        finally:
+            # Frees the client's concurrency slot held by a streamed request
+            response.close()
 
         return {
             "error": "model_call_failed",
@@ -198,112 +439,198 @@ Now return the JSON array:
             "details": err
         }
 
-    data = response.json()
-
+    parser = BookStreamParser(on_book=on_book)
+    broken = None
     try:
-        text_output = data["choices"][0]["message"]["content"].strip()
-    except Exception:
+        for piece in _content_pieces(response):
+            parser.feed(piece)
+    except (ValueError, KeyError, IndexError, TypeError, AttributeError) as e:
+        if not parser.books:
+            return {
+                "error": "invalid_model_response",
+                "raw_response": parser.text[:500]
+            }
+        broken = e
+    except Exception as e:
+        if not parser.books:
+            return {
+                "error": "network_error",
+                "message": str(e)
+            }
+        broken = e
+    finally:
+        response.close()
+
+    books = parser.close()
+    if parser.rejected:
+        _count("rejected_books", parser.rejected)
+    if books and (broken is not None or not parser.complete):
+        # The books before the cut are kept, but the caller must not take
+        # the missing ones as "not identified"
         return {
-            "error": "invalid_model_response",
-            "raw_response": data
+            "error": "truncated_model_response",
+            "message": str(broken) if broken is not None else "The model's reply ended before the list of books was complete.",
+            "books": books
+        }
+    if books or LLM_STRUCTURED_OUTPUT:
+        if books or parser.complete:
+            return books
+        return {
+            "error": "could_not_parse_model_output",
+            "message": "The model's structured output was malformed or truncated.",
+            "raw_text": parser.text[:500],
+            "suggestion": "Try again or check the OCR input quality"
         }
 
-    # ----------------------------
-    # IMPROVED JSON EXTRACTION
-    # ----------------------------
-    def extract_json(s: str):
-        """Extract JSON from text with multiple fallback strategies"""
-        if not s:
-            return None
+    return _unstructured_fallback(parser.text.strip())
 
-        # Strategy 1: Try direct JSON parsing
-        try:
-            return json.loads(s.strip())
-        except:
-            pass
 
-        # Strategy 2: Remove markdown code blocks
-        cleaned = re.sub(r"```json\s*|```\s*", "", s, flags=re.IGNORECASE)
-        cleaned = cleaned.strip()
-        
-        try:
-            return json.loads(cleaned)
-        except:
-            pass
-
-        # Strategy 3: Find JSON object/array boundaries
-        start_match = re.search(r"[\[{]", cleaned)
-        if start_match:
-            start = start_match.start()
-            open_char = cleaned[start]
-            close_char = "]" if open_char == "[" else "}"
-            
-            # Find matching closing bracket
-            depth = 0
-            end = -1
-            for i in range(start, len(cleaned)):
-                if cleaned[i] == open_char:
-                    depth += 1
-                elif cleaned[i] == close_char:
-                    depth -= 1
-                    if depth == 0:
-                        end = i
-                        break
-            
-            if end > start:
-                candidate = cleaned[start:end + 1]
-                try:
-                    return json.loads(candidate)
-                except:
-                    pass
-
-        # Strategy 4: Try to fix common JSON issues
-        # Remove leading/trailing text
-        json_match = re.search(r'(\[.*\]|\{.*\})', cleaned, re.DOTALL)
-        if json_match:
-            candidate = json_match.group(1)
-            try:
-                return json.loads(candidate)
-            except:
-                # Try fixing common issues
-                # Fix single quotes to double quotes
-                fixed = re.sub(r"'([^']*)':", r'"\1":', candidate)
-                fixed = re.sub(r":\s*'([^']*)'", r': "\1"', fixed)
-                try:
-                    return json.loads(fixed)
-                except:
-                    pass
+def _chunk_max_tokens(spines) -> int:
+    return min(LLM_MAX_TOKENS, LLM_BASE_TOKENS + LLM_TOKENS_PER_SPINE * len(spines))
+
+
+def _identify_chunk(spines, on_book=None):
+    with _chunk_slots:
+        return _call_model(_build_prompt(spines), max_tokens=_chunk_max_tokens(spines), on_book=on_book)
+
+
+def _identify_chunks(chunks, on_book=None) -> list:
+
+    """Identify each chunk of spines, concurrently when there are several
+
+    Returns one answer per chunk: a list of books or an error dict. At
+    most LLM_CHUNK_CONCURRENCY chunk calls run at once across all requests.
+    """
+
+    if len(chunks) == 1:
+        return [_identify_chunk(chunks[0], on_book)]
+
+    with ThreadPoolExecutor(max_workers=min(len(chunks), max(1, LLM_CHUNK_CONCURRENCY))) as pool:
+        return list(pool.map(lambda chunk: _identify_chunk(chunk, on_book), chunks))
+
+
+def _book_identity(book):
+    return (str(book.get("title", "")).casefold().strip(), str(book.get("author", "")).casefold().strip())
 
+
+def _spine_index(book):
+    try:
+        return int(book.get("spine"))
+    except (TypeError, ValueError, AttributeError):
         return None
 
-    parsed = extract_json(text_output)
 
-    if parsed is None:
-        # Try to extract any useful information even if JSON parsing fails
-        # Look for title and author patterns in the text
-        fallback_result = []
-        title_match = re.search(r'(?:title|book)[\s:]+["\']?([^"\'\n]+)["\']?', text_output, re.IGNORECASE)
-        author_match = re.search(r'(?:author|by)[\s:]+["\']?([^"\'\n]+)["\']?', text_output, re.IGNORECASE)
-        
-        if title_match or author_match:
-            fallback_result.append({
-                "title": title_match.group(1) if title_match else "Unknown",
-                "author": author_match.group(1) if author_match else "Unknown",
-                "ISBN": "N/A",
-                "description": "Parsed from unstructured model output"
-            })
-            return fallback_result
-        
-        return {
-            "error": "could_not_parse_model_output",
-            "message": "The model returned text that could not be parsed as JSON. This might be due to the model's response format.",
-            "raw_text": text_output[:500],  # Limit to first 500 chars
-            "suggestion": "Try again or check the OCR input quality"
-        }
+def identify(ocr_predictions, on_book=None, errors=None):
+    """
+    Identify books based on OCR predictions from book spines.
+    Returns a Python list of dicts, ready for jsonify().
 
-    if isinstance(parsed, dict):
-        return [parsed]
-    elif isinstance(parsed, list):
-        return parsed
-    else:
-        return []
+    Spines whose normalised OCR text was identified before are answered
+    from the spine cache, then the local catalogue is tried; only spines
+    left without a confident match are sent to the model, once per
+    distinct key, in chunks of LLM_CHUNK_SIZE spines called in parallel.
+    `on_book(book)` is called with each book the model returns as soon as
+    it has been parsed, before the shelf's answers are merged.
+    If only some chunks fail, the books found are still returned; pass a
+    list as `errors` to receive one entry per failed or truncated chunk,
+    with the `spines` left unanswered, so the caller can tell the result
+    is partial.
+    """
+
+    # Group spines by bucket key; empty reads are not worth a model call
+    keys = {}
+    for i, texts in enumerate(ocr_predictions):
+        key = normalise_spine_text(spine_text(texts))
+        if key:
+            keys.setdefault(key, []).append(i)
+
+    catalogue = get_catalogue()
+
+    resolved = {}
+    unseen = []
+    for key, indices in keys.items():
+        cached = spine_cache.get(key)
+        if cached is not None:
+            resolved[key] = cached.get("book")
+            _count("spine_hits")
+            continue
+        _count("spine_misses")
+
+        text = spine_text(ocr_predictions[indices[0]])
+        book = catalogue.match(text) if catalogue else None
+        if book:
+            resolved[key] = book
+            _count("catalogue_hits")
+        else:
+            unseen.append((indices[0], text))
+
+    unmatched = []
+    if unseen:
+        chunks = [unseen[i:i + LLM_CHUNK_SIZE] for i in range(0, len(unseen), max(1, LLM_CHUNK_SIZE))]
+        answers = _identify_chunks(chunks, on_book)
+
+        failed = [books for books in answers if isinstance(books, dict) and "books" not in books]
+        if len(failed) == len(chunks) and not resolved:
+            return failed[0]
+        # Otherwise serve what the cache and the other chunks know rather than failing the whole shelf
+
+        key_by_index = {i: normalise_spine_text(text) for i, text in unseen}
+        for chunk, books in zip(chunks, answers):
+            error = None
+            if isinstance(books, dict):
+                # A truncated reply still carries the books parsed before the cut
+                error = {k: v for k, v in books.items() if k != "books"}
+                books = books.get("books") or []
+
+            chunk_unmatched = False
+            for book in books:
+                if not isinstance(book, dict):
+                    continue
+                key = key_by_index.get(_spine_index(book))
+                if key is None:
+                    # A spine number outside this chunk means nothing to the caller
+                    unmatched.append({k: v for k, v in book.items() if k != "spine"})
+                    chunk_unmatched = True
+                    continue
+                # The first answer for a spine wins
+                if key in resolved:
+                    continue
+                resolved[key] = {k: v for k, v in book.items() if k != "spine"}
+                spine_cache.set(key, {"book": resolved[key]})
+
+            if error is not None:
+                # Spines left without an answer are reported, never cached as unknown
+                if errors is not None:
+                    spines = sorted(j for i, _ in chunk if key_by_index[i] not in resolved
+                                    for j in keys[key_by_index[i]])
+                    errors.append({**error, "spines": spines})
+                continue
+
+            # Spines the model could not identify are remembered as such, unless
+            # some answers came back without a spine number to attribute them to
+            if not chunk_unmatched:
+                for i, text in chunk:
+                    key = key_by_index[i]
+                    if key not in resolved:
+                        resolved[key] = None
+                        spine_cache.set(key, {"book": None})
+
+    # One entry per distinct spine reading (normalised key), in spine order.
+    # Different readings that resolve to the same book are kept apart: on a
+    # shelf they are usually separate copies
+    results = []
+    for key, indices in sorted(keys.items(), key=lambda item: item[1][0]):
+        book = resolved.get(key)
+        if book:
+            results.append({**book, "spine": indices[0]})
+
+    # Books without a spine number have no key; they are compared by title
+    # and author instead, and dropped if a spine's book already matches
+    seen = {_book_identity(book) for book in results}
+    for book in unmatched:
+        identity = _book_identity(book)
+        if identity not in seen:
+            seen.add(identity)
+            results.append(book)
+
+    return results
@@ -0,0 +1,162 @@
+import os
+import re
+import csv
+import sys
+import json
+import threading
+from collections import Counter, defaultdict
+
+# CSV or JSONL dump of the local catalogue; empty disables local matching
+CATALOGUE_PATH = os.getenv("CATALOGUE_PATH", "")
+# Matches scoring below this are handed to the LLM instead
+CATALOGUE_MATCH_THRESHOLD = float(os.getenv("CATALOGUE_MATCH_THRESHOLD", "0.6"))
+
+SAMPLE_CATALOGUE_PATH = os.path.join(os.path.dirname(__file__), "data", "sample_catalogue.csv")
+
+_FIELD_ALIASES = {
+    "title": ("title",),
+    "author": ("author", "authors"),
+    "ISBN": ("isbn", "isbn13", "isbn10"),
+    "description": ("description",),
+}
+
+
+def _normalise(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", str(text).casefold()).split())
+
+
+def trigrams(text: str) -> set:
+
+    """Character trigrams of the normalised text, padded per word so short
+    words and word boundaries still contribute"""
+
+    grams = set()
+    for word in _normalise(text).split():
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _to_book(row: dict):
+    lowered = {str(k).strip().lower(): v for k, v in row.items() if k is not None}
+    book = {}
+    for field, aliases in _FIELD_ALIASES.items():
+        value = next((lowered[a] for a in aliases if lowered.get(a)), None)
+        book[field] = str(value).strip() if value is not None else ("N/A" if field == "ISBN" else "")
+    return book if book["title"] else None
+
+
+def read_catalogue(path) -> list:
+
+    """Read a catalogue dump; `.jsonl` files hold one book object per line,
+    anything else is read as CSV with a header row"""
+
+    books = []
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            book = _to_book(row)
+            if book:
+                books.append(book)
+    return books
+
+
+class CatalogueIndex:
+
+    """Trigram inverted index over title and author of every book
+
+    A query is scored against each candidate sharing at least one trigram
+    with the Dice coefficient of their trigram sets, taking the better of
+    "title + author" and "title" alone since many spines only show the
+    title. The title-only score is capped by how much of the title the
+    query covers, so a lone common word ("THE") cannot match a short title
+    ("The Road"). A match costs time proportional to the posting lists
+    touched rather than the catalogue size.
+    """
+
+    def __init__(self, books=()):
+        self.books = []
+        self._sizes = []
+        self._postings = defaultdict(list)
+        for book in books:
+            self.add(book)
+
+    def add(self, book: dict):
+        book_id = len(self.books)
+        title = trigrams(book["title"])
+        full = title | trigrams(book.get("author", ""))
+        self.books.append(book)
+        self._sizes.append((len(full), len(title)))
+        for gram in full:
+            self._postings[gram].append((book_id, gram in title))
+
+    def __len__(self):
+        return len(self.books)
+
+    def search(self, text: str, limit=5) -> list:
+
+        """Return up to `limit` `(score, book)` pairs, best first"""
+
+        query = trigrams(text)
+        if not query:
+            return []
+
+        full_overlap = Counter()
+        title_overlap = Counter()
+        for gram in query:
+            for book_id, in_title in self._postings.get(gram, ()):
+                full_overlap[book_id] += 1
+                if in_title:
+                    title_overlap[book_id] += 1
+
+        scored = []
+        for book_id, shared in full_overlap.items():
+            full_size, title_size = self._sizes[book_id]
+            title_score = min(
+                2 * title_overlap[book_id] / (len(query) + title_size),
+                title_overlap[book_id] / title_size if title_size else 0.0,
+            )
+            score = max(2 * shared / (len(query) + full_size), title_score)
+            scored.append((score, book_id))
+        scored.sort(reverse=True)
+        return [(round(score, 3), self.books[book_id]) for score, book_id in scored[:limit]]
+
+    def match(self, text: str, threshold=CATALOGUE_MATCH_THRESHOLD):
+        """Return the best book with its score if it clears `threshold`, else None"""
+        hits = self.search(text, limit=1)
+        if hits and hits[0][0] >= threshold:
+            score, book = hits[0]
+            return {**book, "source": "catalogue", "score": score}
+        return None
+
+
+_catalogue = None
+_catalogue_lock = threading.Lock()
+
+
+def get_catalogue():
+
+    """Return the process-wide catalogue index, or None when none is configured"""
+
+    global _catalogue
+    if _catalogue is None and CATALOGUE_PATH:
+        with _catalogue_lock:
+            if _catalogue is None:
+                try:
+                    _catalogue = CatalogueIndex(read_catalogue(CATALOGUE_PATH))
+                    print(f"Loaded {len(_catalogue)} books from catalogue {CATALOGUE_PATH}")
+                except (OSError, ValueError) as e:
+                    print(f"Failed to load catalogue {CATALOGUE_PATH}: {e}")
+                    _catalogue = CatalogueIndex()
+    return _catalogue
+
+
+if __name__ == "__main__":
+    # python -m identifier.catalogue "spine text" [catalogue path]
+    path = sys.argv[2] if len(sys.argv) > 2 else SAMPLE_CATALOGUE_PATH
+    index = CatalogueIndex(read_catalogue(path))
+    for score, book in index.search(sys.argv[1] if len(sys.argv) > 1 else "DUNE FRANK HERBERT"):
+        print(f"{score:.3f}  {book['title']} - {book['author']}")
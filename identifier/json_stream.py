@@ -0,0 +1,176 @@
+import re
+import json
+
+# Schema for one identified book; also sent to OpenRouter as the structured output format
+BOOK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "spine": {"type": "integer"},
+        "title": {"type": "string"},
+        "ISBN": {"type": "string"},
+        "author": {"type": "string"},
+        "description": {"type": "string"},
+    },
+    "required": ["spine", "title", "ISBN", "author", "description"],
+    "additionalProperties": False,
+}
+
+BOOKS_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "books",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"books": {"type": "array", "items": BOOK_SCHEMA}},
+            "required": ["books"],
+            "additionalProperties": False,
+        },
+    },
+}
+
+# Models answering without the schema may leave out everything but the title
+REQUIRED_BOOK_FIELDS = ("title",)
+
+_TYPES = {"string": str, "integer": int}
+_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_STRING_END = re.compile(r'["\\]')
+
+
+def validate_book(obj):
+
+    """Return `obj` if it is a book matching BOOK_SCHEMA, otherwise None
+
+    Missing or null optional fields are allowed; a spine number sent as a
+    string of digits is accepted.
+    """
+
+    if not isinstance(obj, dict):
+        return None
+    if any(not obj.get(field) for field in REQUIRED_BOOK_FIELDS):
+        return None
+
+    for name, spec in BOOK_SCHEMA["properties"].items():
+        value = obj.get(name)
+        if value is None:
+            continue
+        if name == "spine" and isinstance(value, str) and value.strip().isdigit():
+            continue
+        if not isinstance(value, _TYPES[spec["type"]]) or isinstance(value, bool):
+            return None
+    return obj
+
+
+class BookStreamParser:
+
+    """Incremental parser for a JSON array of books
+
+    Text is fed as it arrives and scanned once. The first array found at
+    the top level, or inside the top-level object (`{"books": [...]}`), is
+    the book list; each of its objects is decoded as soon as its closing
+    brace arrives, checked with `validate_book` and passed to `on_book`.
+    `complete` is True once the array is closed. Books decoded before a
+    truncated or malformed tail are kept.
+    """
+
+    def __init__(self, on_book=None, validate=validate_book):
+        self.on_book = on_book
+        self.validate = validate
+        self.books = []
+        self.rejected = 0
+        self.complete = False
+        self._chunks = []
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None
+        self._object_start = None
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return "".join(self._chunks)
+
+    def _emit(self, raw):
+        try:
+            book = self.validate(json.loads(raw))
+        except ValueError:
+            book = None
+        if book is None:
+            self.rejected += 1
+            return
+        self.books.append(book)
+        if self.on_book is not None:
+            self.on_book(book)
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self._chunks.append(chunk)
+        if self._done:
+            return
+
+        text = self._text + chunk
+        pos = self._pos
+        end = len(text)
+
+        while pos < end:
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_END.search(text, pos)
+                if match is None:
+                    pos = end
+                    break
+                pos = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                else:
+                    self._in_string = False
+                continue
+
+            match = _STRUCTURAL.search(text, pos)
+            if match is None:
+                pos = end
+                break
+            char = match.group()
+            pos = match.end()
+
+            if char == '"':
+                self._in_string = True
+            elif char in "[{":
+                if char == "[" and self._array_depth is None and self._depth <= 1:
+                    self._array_depth = self._depth
+                elif char == "{" and self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._object_start = match.start()
+                self._depth += 1
+            else:
+                self._depth -= 1
+                if self._array_depth is None:
+                    continue
+                if self._object_start is not None and self._depth == self._array_depth + 1:
+                    self._emit(text[self._object_start:pos])
+                    self._object_start = None
+                elif self._depth <= self._array_depth:
+                    # The book list is closed (or the brackets no longer balance)
+                    self.complete = char == "]" and self._depth == self._array_depth
+                    self._done = True
+                    break
+
+        # Only an unfinished book needs to be kept between chunks
+        if self._object_start is not None:
+            self._text = text[self._object_start:]
+            self._pos = pos - self._object_start
+            self._object_start = 0
+        else:
+            self._text = ""
+            self._pos = 0
+
+    def close(self) -> list:
+        """Return the books parsed so far"""
+        return self.books
@@ -0,0 +1,287 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed
+import requests
+from requests.adapters import HTTPAdapter
+
+# Rate limits and transient upstream failures are retried; other statuses go back to the caller
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the model while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+
+    """Stop calling a failing upstream for a while
+
+    After `threshold` consecutive failed calls the breaker opens and calls
+    are rejected for `cooldown` seconds. Then a single trial call is let
+    through (half-open): success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.state = "closed"
+        self.opens = 0
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == "closed" or not self.threshold:
+                return True
+            if self.state == "open" and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = "half_open"
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = "closed"
+            self._failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.threshold and (self.state == "half_open" or self._failures >= self.threshold):
+                self.state = "open"
+                self._opened_at = time.monotonic()
+                self.opens += 1
+
+
+def retry_after_seconds(response):
+
+    """Seconds requested by a Retry-After header (delta or HTTP date), or None"""
+
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+
+    """Pooled, retrying HTTP client for chat completion calls
+
+    One keep-alive `requests.Session` is shared by every call. At most
+    `max_concurrency` HTTP requests are in flight; failed attempts (network
+    errors, 429 and 5xx) are retried with jittered exponential backoff, or
+    after the server's Retry-After. An attempt still running after
+    `hedge_after` seconds gets a second, identical request if a slot is
+    free, and whichever answers first wins; the loser is closed.
+
+    With `stream=True` a request keeps its slot until the caller closes
+    the response, so `max_concurrency` still bounds the generations in
+    flight. Hedging can only race the wait for response headers, not a
+    slow body. The breaker hears about a streamed call when it is closed:
+    an error while reading the body counts as a failure.
+    """
+
+    def __init__(self, max_concurrency=8, max_retries=3, backoff_base=0.5, backoff_max=8.0,
+                 retry_after_max=60.0, hedge_after=0.0, breaker=None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_after_max = retry_after_max
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.max_concurrency * 2)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrency)
+        # Hedges can double the in-flight requests, each holding a worker
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency * 2, thread_name_prefix="llm-client")
+        self._stats_lock = threading.Lock()
+        self._stats = {"requests": 0, "retries": 0, "hedges": 0, "hedge_wins": 0, "rejected": 0, "failures": 0,
+                       "in_flight": 0}
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def _submit(self, url, payload, headers, timeout, stream, blocking=True):
+        if not self._slots.acquire(blocking=blocking):
+            return None
+        self._count("requests")
+        self._count("in_flight")
+        return self._executor.submit(self._send, url, payload, headers, timeout, stream)
+
+    def _send(self, url, payload, headers, timeout, stream):
+        try:
+            response = self.session.post(url, json=payload, headers=headers, timeout=timeout, stream=stream)
+        except BaseException:
+            self._release()
+            raise
+        # Set up before the future resolves, so the caller never sees an unguarded response
+        if stream:
+            self._release_on_close(response)
+        else:
+            self._release()
+        return response
+
+    def _release(self):
+        self._count("in_flight", -1)
+        self._slots.release()
+
+    def _release_on_close(self, response):
+
+        """Hold a streamed request's slot until its response is closed"""
+
+        close = response.close
+        once = threading.Lock()
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if once.acquire(blocking=False):
+                    self._release()
+
+        response.close = close_and_release
+
+    def _track_stream(self, response):
+
+        """Report a streamed call to the breaker once its body is done with
+
+        Errors raised while reading the body mark the call failed; closing
+        the response records the outcome.
+        """
+
+        state = {"failed": False}
+
+        def guard(read):
+            def guarded(*args, **kwargs):
+                try:
+                    yield from read(*args, **kwargs)
+                except Exception:
+                    state["failed"] = True
+                    raise
+            return guarded
+
+        response.iter_lines = guard(response.iter_lines)
+        response.iter_content = guard(response.iter_content)
+
+        close = response.close
+        once = threading.Lock()
+
+        def close_and_record():
+            try:
+                close()
+            finally:
+                if once.acquire(blocking=False):
+                    if state["failed"]:
+                        self._count("failures")
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+
+        response.close = close_and_record
+        return response
+
+    @staticmethod
+    def _close_response(future):
+        if future.exception() is None:
+            future.result().close()
+
+    def _attempt(self, url, payload, headers, timeout, stream):
+
+        """Send one request, hedged with a second one if it is slow"""
+
+        primary = self._submit(url, payload, headers, timeout, stream)
+        futures = [primary]
+        if self.hedge_after:
+            done, _ = wait(futures, timeout=self.hedge_after)
+            if not done:
+                hedge = self._submit(url, payload, headers, timeout, stream, blocking=False)
+                if hedge is not None:
+                    futures.append(hedge)
+                    self._count("hedges")
+
+        error = None
+        for future in as_completed(futures):
+            try:
+                response = future.result()
+            except requests.RequestException as e:
+                error = e
+                continue
+            if future is not primary:
+                self._count("hedge_wins")
+            # The other request's response is not needed; closing it frees its connection
+            for other in futures:
+                if other is not future:
+                    other.add_done_callback(self._close_response)
+            return response
+        raise error
+
+    def _backoff(self, response, attempt) -> float:
+        delay = retry_after_seconds(response)
+        if delay is not None:
+            return min(delay, self.retry_after_max)
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay * random.uniform(0.5, 1.0)
+
+    def post(self, url, payload, headers=None, timeout=30, stream=False):
+
+        """POST `payload` as JSON and return the final `requests.Response`
+
+        A retryable status that persists after the last retry is returned
+        as-is. Raises CircuitOpenError while the breaker is open and the
+        last `requests.RequestException` if every attempt failed to connect.
+        With `stream=True` an attempt ends once the response headers arrive
+        and the body is left for the caller to read; the caller must close
+        the response, which frees its slot. A failure while reading the
+        body is not retried.
+        """
+
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise CircuitOpenError("Model calls are paused after repeated failures")
+
+        response, error = None, None
+        for attempt in range(self.max_retries + 1):
+            try:
+                response, error = self._attempt(url, payload, headers, timeout, stream), None
+            except requests.RequestException as e:
+                response, error = None, e
+
+            if response is not None and response.status_code not in RETRY_STATUSES:
+                if stream:
+                    return self._track_stream(response)
+                self.breaker.record_success()
+                return response
+            if attempt == self.max_retries:
+                break
+            if response is not None:
+                response.close()
+            self._count("retries")
+            time.sleep(self._backoff(response, attempt))
+
+        self._count("failures")
+        self.breaker.record_failure()
+        if response is not None:
+            return response
+        raise error
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["breaker_state"] = self.breaker.state
+        stats["breaker_opens"] = self.breaker.opens
+        return stats
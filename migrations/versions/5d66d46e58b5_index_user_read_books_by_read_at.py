@@ -0,0 +1,28 @@
+"""index user_read_books by user and read_at
+
+Revision ID: 5d66d46e58b5
+Revises: 82d429ec465a
+Create Date: 2026-10-18 10:12:31.406118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d66d46e58b5'
+down_revision = '82d429ec465a'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # History pages are keyed on (read_at, id); rows without read_at would never be reached
+    op.execute("UPDATE user_read_books SET read_at = CURRENT_TIMESTAMP WHERE read_at IS NULL")
+    with op.batch_alter_table('user_read_books', schema=None) as batch_op:
+        batch_op.create_index('ix_user_read_books_user_read_at', ['user_id', 'read_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user_read_books', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_read_books_user_read_at')
@@ -0,0 +1,65 @@
+"""full-text search on read books
+
+Revision ID: e4f8250b15ff
+Revises: 5d66d46e58b5
+Create Date: 2026-10-18 11:40:08.215734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f8250b15ff'
+down_revision = '5d66d46e58b5'
+branch_labels = None
+depends_on = None
+
+# Title matches rank above author matches, which rank above description matches
+POSTGRES_SEARCH_VECTOR = """
+    setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(authors, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(description, '')), 'C')
+"""
+
+SQLITE_FTS_COLUMNS = "rowid, title, authors, description"
+SQLITE_FTS_NEW = "new.id, new.title, new.authors, new.description"
+SQLITE_FTS_OLD = "'delete', old.id, old.title, old.authors, old.description"
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # A generated column is kept in sync by PostgreSQL on every insert and update
+        op.execute(f"ALTER TABLE user_read_books ADD COLUMN search_vector tsvector "
+                   f"GENERATED ALWAYS AS ({POSTGRES_SEARCH_VECTOR}) STORED")
+        op.create_index('ix_user_read_books_search', 'user_read_books', ['search_vector'],
+                        postgresql_using='gin')
+
+    elif dialect == 'sqlite':
+        # External-content FTS5 index over user_read_books, kept in sync by triggers
+        op.execute("CREATE VIRTUAL TABLE user_read_books_fts USING fts5("
+                   "title, authors, description, content='user_read_books', content_rowid='id', "
+                   "tokenize='porter unicode61')")
+        op.execute(f"CREATE TRIGGER user_read_books_fts_insert AFTER INSERT ON user_read_books BEGIN "
+                   f"INSERT INTO user_read_books_fts({SQLITE_FTS_COLUMNS}) VALUES ({SQLITE_FTS_NEW}); END")
+        op.execute(f"CREATE TRIGGER user_read_books_fts_delete AFTER DELETE ON user_read_books BEGIN "
+                   f"INSERT INTO user_read_books_fts(user_read_books_fts, {SQLITE_FTS_COLUMNS}) VALUES ({SQLITE_FTS_OLD}); END")
+        op.execute(f"CREATE TRIGGER user_read_books_fts_update AFTER UPDATE ON user_read_books BEGIN "
+                   f"INSERT INTO user_read_books_fts(user_read_books_fts, {SQLITE_FTS_COLUMNS}) VALUES ({SQLITE_FTS_OLD}); "
+                   f"INSERT INTO user_read_books_fts({SQLITE_FTS_COLUMNS}) VALUES ({SQLITE_FTS_NEW}); END")
+        op.execute("INSERT INTO user_read_books_fts(user_read_books_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.drop_index('ix_user_read_books_search', table_name='user_read_books')
+        op.drop_column('user_read_books', 'search_vector')
+
+    elif dialect == 'sqlite':
+        for trigger in ('insert', 'delete', 'update'):
+            op.execute(f"DROP TRIGGER IF EXISTS user_read_books_fts_{trigger}")
+        op.execute("DROP TABLE IF EXISTS user_read_books_fts")
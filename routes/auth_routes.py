@@ -1,9 +1,19 @@
 from flask import Blueprint, request, jsonify
 from services.user_service import create_user, authenticate_user
+from services.password_hasher import HashingBusyError, PASSWORD_HASH_QUEUE_TIMEOUT
+from services.token_service import issue_token, revoke_token, InvalidTokenError
+from utils.auth import bearer_token
 from utils.validators import is_valid_email, is_strong_password , is_valid_username
 
 auth_bp = Blueprint('auth', __name__)
 
+
+def _busy_response(e):
+    """503 telling the client when to retry while password hashing is saturated"""
+    response = jsonify({"error":str(e)})
+    response.headers["Retry-After"] = str(max(1, int(PASSWORD_HASH_QUEUE_TIMEOUT)))
+    return response, 503
+
 @auth_bp.route('/signup', methods=['POST'])
 def register():
     data = request.get_json(silent=True) or {}
@@ -21,7 +31,10 @@ def register():
     if not is_strong_password(password):
         return jsonify({"error":"Password must be at least 8 characters long."}),400
 
-    user = create_user(username , email , password)
+    try:
+        user = create_user(username , email , password)
+    except HashingBusyError as e:
+        return _busy_response(e)
 
     if not user:
         return jsonify({"error":"User registration failed. Email may already be in use."}),400
@@ -38,8 +51,22 @@ def login():
     if not email or not password:
         return jsonify({"error":"Email and password are required."}),400
     
-    user = authenticate_user(email , password)
+    try:
+        user = authenticate_user(email , password)
+    except HashingBusyError as e:
+        return _busy_response(e)
     if not user:
         return jsonify({"error":"Invalid email or password."}),401
     
-    return jsonify({"message":"Login successful."}),200
\ No newline at end of file
+    return jsonify({"message":"Login successful.", **issue_token(user)}),200
+
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    token = bearer_token()
+    if token is None:
+        return jsonify({"error":"Authentication required."}),401
+    try:
+        revoke_token(token)
+    except InvalidTokenError as e:
+        return jsonify({"error":str(e)}),401
+    return jsonify({"message":"Logged out."}),200
\ No newline at end of file
@@ -1,217 +1,415 @@
-from flask import Blueprint, jsonify, request
-from detectors import spine_detector
-from utils.image_utils import read_image , preprocess_image , crop_image
-from identifier.book_identifier import identify
+from flask import Blueprint, jsonify, request, Response, url_for
+from detectors.model_registry import model_stats
+from detectors.inference_scheduler import scheduler_metrics
+from detectors.ocr_backends import get_ocr_backend
+from utils.image_utils import read_image, decode_stats
+from identifier.book_identifier import identifier_stats
+from services.result_cache import result_cache
+from services.identification_pipeline import run_pipeline, run_batch_pipeline, PipelineError
+from services.job_service import job_manager, stream_events, JobQueueFullError, JOB_RETRY_AFTER
+from services.attachment_storage import attachment_store
+from utils.tracing import start_trace, trace_stage
 import os
+from concurrent.futures import ThreadPoolExecutor
 from werkzeug.utils import secure_filename
 from datetime import datetime
 
 book_identifier_bp = Blueprint("book_identifier" , __name__)
 
-# Configuration for file uploads
-UPLOAD_FOLDER = 'uploads'
+# Configuration for file uploads (stored by services/attachment_storage.py)
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf', 'doc', 'docx', 'txt', 'mp3', 'wav', 'ogg'}
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Shelf photos accepted by one batch request, and threads decoding them
+MAX_BATCH_IMAGES = int(os.getenv("MAX_BATCH_IMAGES", "15"))
+BATCH_DECODE_WORKERS = int(os.getenv("BATCH_DECODE_WORKERS", "4"))
 
-# Ensure upload directory exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+_decode_executor = ThreadPoolExecutor(max_workers=max(1, BATCH_DECODE_WORKERS), thread_name_prefix="batch-decode")
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 def save_attached_file(file):
-    """Save attached file and return file info"""
+    """Save attached file and return file info
+
+    The upload is hashed while it is spooled; identical files share one
+    content-addressed blob, written after the response by a background
+    executor.
+    """
     if file and allowed_file(file.filename):
         filename = secure_filename(file.filename)
-        # Add timestamp to avoid filename conflicts
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        filename = f"{timestamp}_{filename}"
-        filepath = os.path.join(UPLOAD_FOLDER, filename)
-        file.save(filepath)
+        stored = attachment_store.save(file.stream)
         
         return {
             'filename': file.filename,
-            'saved_filename': filename,
-            'filepath': filepath,
-            'file_size': os.path.getsize(filepath),
+            'saved_filename': stored['key'],
+            'sha256': stored['sha256'],
+            'file_size': stored['size'],
             'file_type': filename.rsplit('.', 1)[1].lower()
         }
     return None
 
+def _read_uploaded_image():
+
+    """Validate and decode the 'image' upload
+
+    Returns `(img, None)` on success or `(None, (response, status))` with
+    the error to send back.
+    """
+
+    # Check for main image
+    if 'image' not in request.files:
+        return None, (jsonify({'error':'No image uploaded', 'message': 'Please upload an image file'}) , 400)
+    
+    file = request.files['image']
+    error = _image_file_error(file)
+    if error:
+        return None, (jsonify(error) , 400)
+    
+    # Process main image
+    try:
+        return read_image(file), None
+    except Exception as e:
+        return None, (jsonify({
+            'error': 'Failed to read image',
+            'message': str(e)
+        }), 400)
+
+
+def _image_file_error(file):
+
+    """Check an uploaded image's name, type and size; returns the error body or None"""
+
+    if file.filename == '':
+        return {'error':'No image file selected', 'message': 'Please select a valid image file'}
+    
+    if not allowed_file(file.filename):
+        return {
+            'error':'Invalid image file type',
+            'message': f'Allowed file types: png, jpg, jpeg, gif. Received: {file.filename.rsplit(".", 1)[-1] if "." in file.filename else "unknown"}'
+        }
+    
+    # Check file size
+    file.seek(0, os.SEEK_END)
+    file_size = file.tell()
+    file.seek(0)
+    
+    if file_size > MAX_FILE_SIZE:
+        return {
+            'error':'File size too large',
+            'message': f'File size ({file_size / (1024*1024):.2f}MB) exceeds maximum allowed size of {MAX_FILE_SIZE / (1024*1024)}MB'
+        }
+    return None
+
+
+def _decode_image(file):
+    try:
+        return read_image(file), None
+    except Exception as e:
+        return None, {'error': 'Failed to read image', 'message': str(e)}
+
+
+def _read_uploaded_images():
+
+    """Validate the 'images' uploads and decode them in parallel
+
+    Returns `(images, None)`, where `images` holds one `(filename, img,
+    error)` per upload, or `(None, (response, status))` when the request
+    itself is unusable.
+    """
+
+    files = [file for file in request.files.getlist('images') if file.filename != '']
+    if not files:
+        return None, (jsonify({'error':'No images uploaded', 'message': 'Please upload one or more image files as "images"'}) , 400)
+    if len(files) > MAX_BATCH_IMAGES:
+        return None, (jsonify({
+            'error': 'Too many images',
+            'message': f'{len(files)} images uploaded; at most {MAX_BATCH_IMAGES} are accepted per batch'
+        }), 400)
+
+    errors = [_image_file_error(file) for file in files]
+    # cv2 releases the GIL while decoding, so photos decode side by side
+    futures = [None if error else _decode_executor.submit(_decode_image, file) for file, error in zip(files, errors)]
+
+    images = []
+    for file, error, future in zip(files, errors, futures):
+        img = None
+        if future is not None:
+            img, error = future.result()
+        images.append((file.filename, img, error))
+    return images, None
+
+
+def _save_attached_files() -> list:
+
+    """Save files sent as 'attached_files' or 'files' and describe them"""
+
+    attached_files_info = []
+    try:
+        # 'files' is accepted as an alternative name for 'attached_files'
+        for key in ('attached_files', 'files'):
+            if key not in request.files:
+                continue
+            for attached_file in request.files.getlist(key):
+                if attached_file.filename != '':  # Check if file was actually uploaded
+                    file_info = save_attached_file(attached_file)
+                    if file_info:
+                        attached_files_info.append({
+                            'original_filename': file_info['filename'],
+                            'saved_filename': file_info['saved_filename'],
+                            'sha256': file_info['sha256'],
+                            'file_size': file_info['file_size'],
+                            'file_type': file_info['file_type'],
+                            'uploaded_at': datetime.now().isoformat()
+                        })
+    except Exception as e:
+        print(f"Error processing attached files: {e}")
+        # Continue even if attached files fail
+
+    return attached_files_info
+
+
+def _identify_response(result, attached_files_info) -> dict:
+
+    """Build the identify endpoint's response body from a pipeline result"""
+
+    if not result['spines']:
+        return {
+            'detections': [],
+            'attached_files': attached_files_info,
+            'message': 'No book spines detected in the image',
+            'cache': result['cache'],
+            'success': True
+        }
+
+    body = {
+        'detections': result['detections'], 
+        'book_info': result['book_info'],
+        'attached_files': attached_files_info,
+        'attached_files_count': len(attached_files_info),
+        'cache': result['cache'],
+        'success': True
+    }
+    # Spines left unidentified because their model call failed; uploading again retries them
+    if result.get('identify_errors'):
+        body['identify_errors'] = result['identify_errors']
+    return body
+
+
+def _timings_requested() -> bool:
+    """Whether the caller asked for per-stage timings with ?timings=1"""
+    value = request.args.get('timings') or request.form.get('timings') or ''
+    return value.lower() in ('1', 'true', 'yes')
+
+
+def _ocr_backend_requested():
+    """OCR backend chosen with ?ocr_backend=tesseract, or None for the configured default"""
+    return request.args.get('ocr_backend') or request.form.get('ocr_backend') or None
+
+
+def _run_job(img, attached_files_info, timings=False, ocr_backend=None, on_event=None) -> dict:
+    with start_trace('identify_job') as trace:
+        body = _identify_response(run_pipeline(img, on_event=on_event, ocr_backend=ocr_backend), attached_files_info)
+    if timings:
+        body['timings'] = trace.to_dict()
+    return body
+
+
 @book_identifier_bp.route('/identifying_books',methods=['POST'])
 def identify_books() -> dict:
 
     """Endpoint to detect spines in a uploaded image with optional file attachments"""
 
     try:
-        from ultralytics import YOLO
-        import easyocr
-        import cv2
-        from PIL import Image
-        import numpy as np
+        with start_trace('identify_books') as trace:
+            with trace_stage('read_image'):
+                img, error = _read_uploaded_image()
+            if error:
+                return error
+
+            try:
+                result = run_pipeline(img, ocr_backend=_ocr_backend_requested())
+            except PipelineError as e:
+                return jsonify(e.to_dict()), e.status
+
+            with trace_stage('save_attachments'):
+                attached_files_info = _save_attached_files()
+
+        body = _identify_response(result, attached_files_info)
+        if _timings_requested():
+            body['timings'] = trace.to_dict()
+        return jsonify(body), 200
+        
+    except Exception as e:
         import traceback
-    except ImportError as e:
+        error_trace = traceback.format_exc()
+        print(f"Unexpected error in identify_books: {error_trace}")
         return jsonify({
-            'error': 'Required library not installed',
+            'error': 'Internal server error',
             'message': str(e),
-            'details': 'Please install required dependencies: ultralytics, easyocr, opencv-python, pillow, numpy'
+            'traceback': error_trace
         }), 500
 
+
+@book_identifier_bp.route('/identifying_books/batch', methods=['POST'])
+def identify_books_batch():
+
+    """Identify the books on several photos of one bookcase in a single request
+
+    Photos are uploaded as repeated 'images' fields. They are decoded in
+    parallel, detected as one batch and OCR'd in one pass; a spine seen in
+    overlapping photos is identified once, with `seen_in` listing each
+    photo and spine it appears in. Photos that fail to decode are reported
+    per image and the rest are still processed.
+    """
+
     try:
-        # Check for main image
-        if 'image' not in request.files:
-            return jsonify({'error':'No image uploaded', 'message': 'Please upload an image file'}) , 400
-        
-        file = request.files['image']
-        
-        # Validate main image file
-        if file.filename == '':
-            return jsonify({'error':'No image file selected', 'message': 'Please select a valid image file'}) , 400
-        
-        if not allowed_file(file.filename):
-            return jsonify({
-                'error':'Invalid image file type',
-                'message': f'Allowed file types: png, jpg, jpeg, gif. Received: {file.filename.rsplit(".", 1)[-1] if "." in file.filename else "unknown"}'
-            }) , 400
-        
-        # Check file size
-        file.seek(0, os.SEEK_END)
-        file_size = file.tell()
-        file.seek(0)
-        
-        if file_size > MAX_FILE_SIZE:
-            return jsonify({
-                'error':'File size too large',
-                'message': f'File size ({file_size / (1024*1024):.2f}MB) exceeds maximum allowed size of {MAX_FILE_SIZE / (1024*1024)}MB'
-            }) , 400
-        
-        # Process main image
-        try:
-            img = read_image(file)
-        except Exception as e:
-            return jsonify({
-                'error': 'Failed to read image',
-                'message': str(e)
-            }), 400
-
-        try:
-            model_img = preprocess_image(img , target_size=(640,640) , to_rgb=True , keep_aspect_ratio=True)
-        except Exception as e:
-            return jsonify({
-                'error': 'Failed to preprocess image',
-                'message': str(e)
-            }), 500
-
-        try:
-            # Initialize YOLO model
-            model = YOLO('models/best.pt').to("cpu")
-            results = spine_detector.spine_detector(model_img, model, confidence_threshold=0.5, device="cpu")
-        except FileNotFoundError:
-            return jsonify({
-                'error': 'Model file not found',
-                'message': 'YOLO model file (models/best.pt) not found. Please ensure the model file exists.'
-            }), 500
-        except Exception as e:
-            return jsonify({
-                'error': 'Failed to detect book spines',
-                'message': str(e)
-            }), 500
-
-        try:
-            crops = crop_image(model_img , results)
-            outputs = []
-            
-            # Initialize EasyOCR reader
-            reader = easyocr.Reader(['en'], gpu=False)
-            
-            for cropped_array in crops:
-                try:
-                    cropped_rgb = cv2.cvtColor(cropped_array, cv2.COLOR_RGB2BGR)
-                    pil_crop = Image.fromarray(cropped_rgb)
-                    rotated_crop_nparray = pil_crop.rotate(90, expand=True)
-
-                    if not isinstance(rotated_crop_nparray, np.ndarray):
-                        rotated_crop_nparray = np.array(rotated_crop_nparray)
-                    
-                    result = reader.readtext(rotated_crop_nparray)
-                    texts =[(text, conf) for (_, text, conf) in result]
-                    outputs.append(texts)
-                except Exception as e:
-                    print(f"Error processing crop: {e}")
-                    continue
-        except Exception as e:
-            return jsonify({
-                'error': 'Failed to process OCR',
-                'message': str(e)
-            }), 500
-
-        # Process attached files
-        attached_files_info = []
-        try:
-            if 'attached_files' in request.files:
-                attached_files = request.files.getlist('attached_files')
-                for attached_file in attached_files:
-                    if attached_file.filename != '':  # Check if file was actually uploaded
-                        file_info = save_attached_file(attached_file)
-                        if file_info:
-                            attached_files_info.append({
-                                'original_filename': file_info['filename'],
-                                'saved_filename': file_info['saved_filename'],
-                                'file_size': file_info['file_size'],
-                                'file_type': file_info['file_type'],
-                                'uploaded_at': datetime.now().isoformat()
-                            })
-            
-            # Also check for 'files' key (alternative naming)
-            if 'files' in request.files:
-                attached_files = request.files.getlist('files')
-                for attached_file in attached_files:
-                    if attached_file.filename != '':
-                        file_info = save_attached_file(attached_file)
-                        if file_info:
-                            attached_files_info.append({
-                                'original_filename': file_info['filename'],
-                                'saved_filename': file_info['saved_filename'],
-                                'file_size': file_info['file_size'],
-                                'file_type': file_info['file_type'],
-                                'uploaded_at': datetime.now().isoformat()
-                            })
-        except Exception as e:
-            print(f"Error processing attached files: {e}")
-            # Continue even if attached files fail
-
-        if not results:
-            return jsonify({
-                'detections': [],
-                'attached_files': attached_files_info,
-                'message': 'No book spines detected in the image',
-                'success': True
-            }), 200
-        
-        try:
-            book_info = identify(ocr_predictions=outputs)
-        except Exception as e:
-            print(f"Error identifying books: {e}")
-            book_info = {
-                'error': 'Failed to identify books',
-                'message': str(e)
-            }
-        
-        return jsonify({
-            'detections': outputs, 
+        with start_trace('identify_books_batch') as trace:
+            with trace_stage('read_image'):
+                images, error = _read_uploaded_images()
+            if error:
+                return error
+
+            decoded = [i for i, (_, img, _) in enumerate(images) if img is not None]
+            if not decoded:
+                return jsonify({
+                    'error': 'Failed to read images',
+                    'message': 'None of the uploaded images could be read',
+                    'images': [{'filename': filename, **error} for filename, _, error in images]
+                }), 400
+
+            try:
+                result = run_batch_pipeline([images[i][1] for i in decoded], ocr_backend=_ocr_backend_requested())
+            except PipelineError as e:
+                return jsonify(e.to_dict()), e.status
+
+            with trace_stage('save_attachments'):
+                attached_files_info = _save_attached_files()
+
+        # Report every upload in its original order, with pipeline image indices mapped back
+        position = {batch_index: i for batch_index, i in enumerate(decoded)}
+        images_info = [{'filename': filename, **(error or {})} for filename, _, error in images]
+        for batch_index, i in position.items():
+            images_info[i].update({
+                'spines': result['spines'][batch_index],
+                'detections': result['detections'][batch_index],
+                'rotations': result['rotations'][batch_index]
+            })
+
+        book_info = result['book_info']
+        if isinstance(book_info, list):
+            for book in book_info:
+                if isinstance(book, dict) and 'seen_in' in book:
+                    book['image'] = position[book['image']]
+                    for sighting in book['seen_in']:
+                        sighting['image'] = position[sighting['image']]
+        for identify_error in result['identify_errors']:
+            for sighting in identify_error['spines']:
+                sighting['image'] = position[sighting['image']]
+
+        body = {
+            'images': images_info,
             'book_info': book_info,
+            'total_spines': sum(len(spines) for spines in result['spines']),
+            'unique_spines': result['unique_spines'],
+            'identify_errors': result['identify_errors'],
             'attached_files': attached_files_info,
             'attached_files_count': len(attached_files_info),
             'success': True
-        }), 200
-        
+        }
+        if _timings_requested():
+            body['timings'] = trace.to_dict()
+        return jsonify(body), 200
+
     except Exception as e:
         import traceback
         error_trace = traceback.format_exc()
-        print(f"Unexpected error in identify_books: {error_trace}")
+        print(f"Unexpected error in identify_books_batch: {error_trace}")
         return jsonify({
             'error': 'Internal server error',
             'message': str(e),
             'traceback': error_trace
         }), 500
+
+
+def _queue_full_response(e):
+    """503 telling the client when to retry while the job queue is full"""
+    response = jsonify({'error': 'Job queue full', 'message': str(e)})
+    response.headers['Retry-After'] = str(max(1, JOB_RETRY_AFTER))
+    return response, 503
+
+
+@book_identifier_bp.route('/identifying_books/jobs', methods=['POST'])
+def create_identify_job():
+
+    """Start identification in the background and return a job id at once
+
+    Progress is available from the status URL or as Server-Sent Events
+    from the stream URL: "detections", one "ocr" per spine, "books", then
+    "done" with the same body the synchronous endpoint returns (or
+    "failed" with its error body).
+    """
+
+    ocr_backend = _ocr_backend_requested()
+    try:
+        get_ocr_backend(ocr_backend)
+    except ValueError as e:
+        return jsonify({'error': 'Invalid OCR backend', 'message': str(e)}), 400
+
+    # Refuse early when the queue is full, before decoding the upload
+    try:
+        job_manager.check_capacity()
+    except JobQueueFullError as e:
+        return _queue_full_response(e)
+
+    img, error = _read_uploaded_image()
+    if error:
+        return error
+
+    # Uploads are only readable during the request, so attachments are saved here
+    attached_files_info = _save_attached_files()
+    try:
+        job = job_manager.submit(_run_job, img, attached_files_info, timings=_timings_requested(),
+                                 ocr_backend=ocr_backend)
+    except JobQueueFullError as e:
+        return _queue_full_response(e)
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': url_for('book_identifier.get_identify_job', job_id=job.id),
+        'stream_url': url_for('book_identifier.stream_identify_job', job_id=job.id)
+    }), 202
+
+
+@book_identifier_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_identify_job(job_id):
+    """Return a job's status, the events so far and its final result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'message': f'No job with id {job_id}'}), 404
+    return jsonify(job.snapshot()), 200
+
+
+@book_identifier_bp.route('/jobs/<job_id>/stream', methods=['GET'])
+def stream_identify_job(job_id):
+    """Stream a job's progress as Server-Sent Events"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found', 'message': f'No job with id {job_id}'}), 404
+    return Response(stream_events(job), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@book_identifier_bp.route('/models/status', methods=['GET'])
+def models_status():
+    """Report which models are loaded, their load time and process memory"""
+    return jsonify({
+        **model_stats(),
+        'spine_scheduler': scheduler_metrics(),
+        'result_cache': result_cache.stats(),
+        'identifier': identifier_stats(),
+        'image_decode': decode_stats(),
+        'attachments': attachment_store.stats(),
+        'jobs': job_manager.stats()
+    }), 200
@@ -0,0 +1,84 @@
+from flask import Blueprint, request, jsonify, g
+from utils.auth import login_required
+from services.book_service import add_read_books_bulk, get_read_history, MAX_BULK_BOOKS, DEFAULT_HISTORY_PAGE_SIZE
+from services.search_service import search_read_books, SearchUnavailableError, DEFAULT_SEARCH_PAGE_SIZE
+
+book_bp = Blueprint('books', __name__)
+
+
+@book_bp.route('/read/bulk', methods=['POST'])
+@login_required
+def add_read_books():
+
+    """Save every book identified on a shelf to the user's read list at once
+
+    Body: `{"books": [{"title", "author", "ISBN", "description"}, ...]}`,
+    the book shape returned by the identify endpoints. The books are saved
+    for the user the access token belongs to.
+    """
+
+    data = request.get_json(silent=True) or {}
+    books = data.get("books")
+
+    if not isinstance(books, list) or not books:
+        return jsonify({"error":"books must be a non-empty list."}),400
+    if len(books) > MAX_BULK_BOOKS:
+        return jsonify({"error":f"At most {MAX_BULK_BOOKS} books can be imported at once."}),400
+
+    try:
+        result = add_read_books_bulk(g.principal.id, books)
+    except Exception as e:
+        return jsonify({"error":"Failed to save books.", "message": str(e)}),500
+
+    return jsonify({
+        **result,
+        "inserted_count": len(result["inserted"]),
+        "duplicate_count": len(result["duplicates"]),
+        "invalid_count": len(result["invalid"])
+    }),200
+
+
+@book_bp.route('/read', methods=['GET'])
+@login_required
+def read_history():
+
+    """Page through the caller's read books, newest first
+
+    Query: optional `limit` (max 100) and `cursor` (the `next_cursor` of
+    the previous page).
+    """
+
+    limit = request.args.get("limit", DEFAULT_HISTORY_PAGE_SIZE, type=int)
+    cursor = request.args.get("cursor")
+
+    try:
+        page = get_read_history(g.principal.id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        return jsonify({"error":str(e)}),400
+
+    return jsonify(page),200
+
+
+@book_bp.route('/read/search', methods=['GET'])
+@login_required
+def search_read_history():
+
+    """Search the caller's read books by title, author or description
+
+    Query: `q`, optional `limit` (max 100) and `offset` (the
+    `next_offset` of the previous page). Best matches come first.
+    """
+
+    query = request.args.get("q", "").strip()
+    limit = request.args.get("limit", DEFAULT_SEARCH_PAGE_SIZE, type=int)
+    offset = request.args.get("offset", 0, type=int)
+
+    if not query:
+        return jsonify({"error":"A search query (q) is required."}),400
+
+    try:
+        results = search_read_books(g.principal.id, query, limit=limit, offset=offset)
+    except SearchUnavailableError as e:
+        return jsonify({"error":str(e)}),501
+
+    return jsonify(results),200
@@ -0,0 +1,32 @@
+from flask import Blueprint, Response
+from utils.tracing import render_metrics
+from database.db_setup import pool_stats
+
+metrics_bp = Blueprint("metrics" , __name__)
+
+
+def render_pool_metrics() -> str:
+    """Database connection pool gauges in the Prometheus text format"""
+    stats = pool_stats()
+    if not stats:
+        return ""
+    lines = [
+        "# HELP db_pool_connections Pooled database connections by state",
+        "# TYPE db_pool_connections gauge",
+    ]
+    for engine, pool in stats.items():
+        for state in ("checked_out", "checked_in", "overflow"):
+            lines.append(f'db_pool_connections{{engine="{engine}",state="{state}"}} {pool[state]}')
+    lines += [
+        "# HELP db_pool_utilisation Checked-out connections over pool size plus overflow",
+        "# TYPE db_pool_utilisation gauge",
+    ]
+    for engine, pool in stats.items():
+        lines.append(f'db_pool_utilisation{{engine="{engine}"}} {pool["utilisation"]}')
+    return "\n".join(lines) + "\n"
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose pipeline stage histograms and database pool gauges in the Prometheus text format"""
+    return Response(render_metrics() + render_pool_metrics(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,165 @@
+import os
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# "local" stores blobs under ATTACHMENT_DIR, "s3" in a bucket (AWS or a local S3-compatible server)
+ATTACHMENT_BACKEND = os.getenv("ATTACHMENT_BACKEND", "local").lower()
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", "uploads")
+ATTACHMENT_S3_BUCKET = os.getenv("ATTACHMENT_S3_BUCKET", "book-finder-attachments")
+# e.g. http://localhost:9000 for MinIO; unset uses AWS
+ATTACHMENT_S3_ENDPOINT = os.getenv("ATTACHMENT_S3_ENDPOINT") or None
+ATTACHMENT_S3_PREFIX = os.getenv("ATTACHMENT_S3_PREFIX", "attachments/")
+ATTACHMENT_WORKERS = int(os.getenv("ATTACHMENT_WORKERS", "2"))
+ATTACHMENT_CHUNK_SIZE = 1024 * 1024
+
+
+class LocalStorageBackend:
+
+    """Content-addressed blobs in a local directory"""
+
+    name = "local"
+
+    def __init__(self, root=ATTACHMENT_DIR):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def exists(self, key) -> bool:
+        return os.path.exists(self.path(key))
+
+    def put_file(self, key, tmp_path):
+        """Move a finished temp file into place; the rename is atomic"""
+        target = self.path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(tmp_path, target)
+
+
+class S3StorageBackend:
+
+    """Content-addressed blobs in an S3 bucket
+
+    Point `endpoint_url` at a local S3-compatible server (MinIO,
+    LocalStack, ...) to develop without AWS. Needs boto3.
+    """
+
+    name = "s3"
+
+    def __init__(self, bucket=ATTACHMENT_S3_BUCKET, endpoint_url=ATTACHMENT_S3_ENDPOINT, prefix=ATTACHMENT_S3_PREFIX):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client = boto3.client("s3", endpoint_url=endpoint_url)
+        self._client_error = ClientError
+
+    def exists(self, key) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+            return True
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def put_file(self, key, tmp_path):
+        self._client.upload_file(tmp_path, self.bucket, self.prefix + key)
+        os.remove(tmp_path)
+
+
+def load_backend(name=ATTACHMENT_BACKEND):
+    """Create the configured attachment storage backend"""
+    if name == "local":
+        return LocalStorageBackend()
+    if name == "s3":
+        return S3StorageBackend()
+    raise ValueError(f"Unknown attachment backend: {name}")
+
+
+class AttachmentStore:
+
+    """Store uploads as content-addressed blobs, off the request path
+
+    `save()` streams an upload in chunks to a temp file while hashing it,
+    then returns at once; a background executor moves the file into the
+    backend under its SHA-256, or drops it if that blob already exists.
+    """
+
+    def __init__(self, backend=None, workers=ATTACHMENT_WORKERS, chunk_size=ATTACHMENT_CHUNK_SIZE,
+                 tmp_dir=os.path.join(ATTACHMENT_DIR, ".tmp")):
+        self._backend = backend
+        self._backend_lock = threading.Lock()
+        self.chunk_size = chunk_size
+        self.tmp_dir = tmp_dir
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="attachments")
+        self._stats_lock = threading.Lock()
+        self._stats = {"saved": 0, "deduplicated": 0, "failed": 0, "bytes_written": 0}
+
+    @property
+    def backend(self):
+        # Created on first use so importing the app never needs boto3 or the upload dir
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = load_backend()
+        return self._backend
+
+    def _count(self, name, n=1):
+        with self._stats_lock:
+            self._stats[name] += n
+
+    def _store(self, key, tmp_path, size):
+        try:
+            if self.backend.exists(key):
+                os.remove(tmp_path)
+                self._count("deduplicated")
+                return
+            self.backend.put_file(key, tmp_path)
+            self._count("saved")
+            self._count("bytes_written", size)
+        except Exception as e:
+            self._count("failed")
+            print(f"Error storing attachment {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def save(self, stream) -> dict:
+
+        """Spool and hash an upload stream; storage finishes in the background
+
+        Returns the blob key (`<sha[:2]>/<sha>`), the SHA-256 and the size
+        counted while streaming. Returns a future too, for callers that
+        need to wait for the blob to land.
+        """
+
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                    digest.update(chunk)
+                    tmp.write(chunk)
+                    size += len(chunk)
+        except Exception:
+            os.remove(tmp_path)
+            raise
+
+        sha256 = digest.hexdigest()
+        key = f"{sha256[:2]}/{sha256}"
+        future = self._executor.submit(self._store, key, tmp_path, size)
+        return {"key": key, "sha256": sha256, "size": size, "future": future}
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["backend"] = ATTACHMENT_BACKEND if self._backend is None else self._backend.name
+        return stats
+
+
+attachment_store = AttachmentStore()
@@ -1,7 +1,22 @@
+import json
+import base64
+from datetime import datetime, timezone
 from database.models import UserReadBook 
-from database.db_setup import db
+from database.db_setup import db, read_replica
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import load_only
 from sqlalchemy.exc import IntegrityError
 
+# Upper bound on books accepted by one bulk import
+MAX_BULK_BOOKS = 500
+
+# Reading history page sizes
+DEFAULT_HISTORY_PAGE_SIZE = 20
+MAX_HISTORY_PAGE_SIZE = 100
+
+# ISBN placeholders the identifier returns when it does not know one
+_MISSING_ISBNS = {"", "n/a", "na", "none", "unknown"}
+
 def add_read_book(user_id , title, authors=None , isbn=None, description=None) -> UserReadBook:
     """ create a new read book entry for a user and add to the database."""
     
@@ -20,4 +35,172 @@ def add_read_book(user_id , title, authors=None , isbn=None, description=None) -
         return read_book
     except IntegrityError:
         db.session.rollback()
-        raise ValueError("This book has already been added to the user's read list.")
\ No newline at end of file
+        raise ValueError("This book has already been added to the user's read list.")
+
+
+def _clean_isbn(isbn):
+    if isbn is None:
+        return None
+    isbn = str(isbn).strip()
+    return None if isbn.lower() in _MISSING_ISBNS else isbn
+
+
+def _book_row(user_id, book, read_at):
+
+    """Map an identified book (identify() or UserReadBook field names) to a row"""
+
+    title = str(book.get("title") or "").strip()
+    if not title:
+        return None
+    authors = book.get("authors", book.get("author"))
+    return {
+        "user_id": user_id,
+        "title": title[:300],
+        "authors": str(authors)[:200] if authors else None,
+        "isbn": _clean_isbn(book.get("isbn", book.get("ISBN"))),
+        "description": book.get("description"),
+        "read_at": read_at,
+    }
+
+
+def _insert_ignoring_duplicates(rows) -> set:
+
+    """Insert rows in one statement, skipping ones that hit unique_user_book
+
+    Returns the ISBNs that were inserted. Uses INSERT ... ON CONFLICT DO
+    NOTHING on PostgreSQL and SQLite; other databases check existing ISBNs
+    first inside the same transaction.
+    """
+
+    table = UserReadBook.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+            conflict = {"constraint": "unique_user_book"}
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+            # SQLite names the conflict target by its columns
+            conflict = {"index_elements": ["user_id", "isbn"]}
+        stmt = (
+            dialect_insert(table)
+            .values(rows)
+            .on_conflict_do_nothing(**conflict)
+            .returning(table.c.isbn)
+        )
+        return {isbn for (isbn,) in db.session.execute(stmt)}
+
+    isbns = [row["isbn"] for row in rows if row["isbn"] is not None]
+    existing = set(db.session.scalars(
+        select(table.c.isbn).where(table.c.user_id == rows[0]["user_id"], table.c.isbn.in_(isbns))
+    )) if isbns else set()
+    new_rows = [row for row in rows if row["isbn"] is None or row["isbn"] not in existing]
+    if new_rows:
+        db.session.execute(insert(table), new_rows)
+    return {row["isbn"] for row in new_rows}
+
+
+def add_read_books_bulk(user_id, books) -> dict:
+
+    """Add many identified books to a user's read list in one transaction
+
+    Books without a title are reported as invalid. A book whose ISBN is
+    already on the user's list, or repeated in `books`, is reported as a
+    duplicate; books without an ISBN are always added. Returns
+    `{'inserted': [...], 'duplicates': [...], 'invalid': [...]}` where each
+    entry is the input book (invalid entries carry their index).
+    """
+
+    read_at = datetime.now(timezone.utc)
+    rows, kept, invalid, duplicates = [], [], [], []
+    seen_isbns = set()
+
+    for i, book in enumerate(books):
+        row = _book_row(user_id, book, read_at) if isinstance(book, dict) else None
+        if row is None:
+            invalid.append({"index": i, "book": book})
+            continue
+        if row["isbn"] is not None:
+            if row["isbn"] in seen_isbns:
+                duplicates.append(book)
+                continue
+            seen_isbns.add(row["isbn"])
+        rows.append(row)
+        kept.append(book)
+
+    inserted = []
+    if rows:
+        try:
+            inserted_isbns = _insert_ignoring_duplicates(rows)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        for row, book in zip(rows, kept):
+            if row["isbn"] is None or row["isbn"] in inserted_isbns:
+                inserted.append(book)
+            else:
+                duplicates.append(book)
+
+    return {"inserted": inserted, "duplicates": duplicates, "invalid": invalid}
+
+
+def encode_history_cursor(read_book) -> str:
+    """Opaque cursor pointing just after `read_book` in the history order"""
+    position = {"read_at": read_book.read_at.isoformat(), "id": read_book.id}
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+def decode_history_cursor(cursor):
+    """Return `(read_at, id)` from a cursor, raising ValueError if it is malformed"""
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(position["read_at"]), int(position["id"])
+    except (ValueError, TypeError, KeyError, AttributeError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def get_read_history(user_id, limit=DEFAULT_HISTORY_PAGE_SIZE, cursor=None) -> dict:
+
+    """Return one page of a user's read books, newest first
+
+    Keyset pagination on (read_at, id) served by the
+    ix_user_read_books_user_read_at index, so every page costs the same
+    however deep it is. Only list columns are loaded; `description` is not.
+    Returns `{'books': [...], 'next_cursor': str | None}`.
+    """
+
+    limit = max(1, min(int(limit), MAX_HISTORY_PAGE_SIZE))
+
+    query = (
+        select(UserReadBook)
+        .options(load_only(UserReadBook.id, UserReadBook.title, UserReadBook.authors,
+                           UserReadBook.isbn, UserReadBook.read_at))
+        .where(UserReadBook.user_id == user_id)
+    )
+    if cursor:
+        read_at, last_id = decode_history_cursor(cursor)
+        query = query.where(tuple_(UserReadBook.read_at, UserReadBook.id) < tuple_(read_at, last_id))
+
+    # One extra row tells whether another page exists
+    with read_replica():
+        rows = db.session.scalars(
+            query.order_by(UserReadBook.read_at.desc(), UserReadBook.id.desc()).limit(limit + 1)
+        ).all()
+
+    page = rows[:limit]
+    return {
+        "books": [
+            {
+                "id": book.id,
+                "title": book.title,
+                "authors": book.authors,
+                "isbn": book.isbn,
+                "read_at": book.read_at.isoformat() if book.read_at else None,
+            }
+            for book in page
+        ],
+        "next_cursor": encode_history_cursor(page[-1]) if len(rows) > limit else None,
+    }
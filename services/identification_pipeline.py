@@ -0,0 +1,299 @@
+import os
+from detectors import spine_detector, inference_scheduler
+from detectors.model_registry import model_version
+from detectors.ocr_backends import get_ocr_backend
+from detectors.spine_orientation import read_oriented, ORIENTATION_MIN_CONFIDENCE
+from utils.image_utils import preprocess_image , crop_image , map_boxes_to_original
+from identifier.book_identifier import identify, spine_text, normalise_spine_text
+from identifier.catalogue import trigrams
+from services.result_cache import result_cache, image_cache_key
+from utils.tracing import trace_stage
+
+# Pipeline settings; all are part of the result cache key
+DETECTION_CONFIDENCE = 0.5
+# Spines are cropped from the original photo; longer crops are downscaled to this size
+CROP_MAX_SIDE = int(os.getenv("CROP_MAX_SIDE", "1280"))
+# Spines from different photos of a batch whose OCR text is at least this
+# similar (trigram Dice score) are treated as the same physical book
+BATCH_DEDUP_THRESHOLD = float(os.getenv("BATCH_DEDUP_THRESHOLD", "0.8"))
+
+
+class PipelineError(Exception):
+
+    """A pipeline stage failed; carries the JSON error body and HTTP status
+    the identify endpoints have always returned for that stage"""
+
+    def __init__(self, error, message, status=500):
+        super().__init__(message)
+        self.error = error
+        self.message = message
+        self.status = status
+
+    def to_dict(self) -> dict:
+        return {'error': self.error, 'message': self.message}
+
+
+def _emit(on_event, name, data):
+    if on_event is not None:
+        on_event(name, data)
+
+
+def run_pipeline(img, on_event=None, ocr_backend=None) -> dict:
+
+    """Run preprocess -> spine detection -> OCR -> identification on a decoded image
+
+    `on_event(name, data)` is called as each stage finishes: "detections"
+    with the spine boxes, one "ocr" per spine with its text, a "book" for
+    each book as the model streams it back, then "books" with the
+    identification result. Returns the spines, per-spine OCR
+    output, book info, the errors of any chunks of spines that could not
+    be identified and whether the result came from the cache.
+    `ocr_backend` names the OCR backend to use (default: OCR_BACKEND).
+    """
+
+    try:
+        ocr = get_ocr_backend(ocr_backend)
+    except ValueError as e:
+        raise PipelineError('Invalid OCR backend', str(e), status=400)
+
+    # Identical uploads (same pixels, model and thresholds) reuse the stored result
+    with trace_stage('cache_lookup'):
+        cache_key = image_cache_key(img, model_version(), DETECTION_CONFIDENCE, ORIENTATION_MIN_CONFIDENCE, CROP_MAX_SIDE, ocr.name)
+        cached = result_cache.get(cache_key)
+
+    if cached is not None:
+        _emit(on_event, 'detections', {'spines': cached['spines']})
+        for i, texts in enumerate(cached['detections']):
+            _emit(on_event, 'ocr', {'spine': i, 'texts': texts})
+        _emit(on_event, 'books', {'book_info': cached['book_info']})
+        return {**cached, 'cache': 'hit'}
+
+    try:
+        with trace_stage('preprocess_image'):
+            model_img, transform = preprocess_image(img , target_size=(640,640) , to_rgb=True , keep_aspect_ratio=True , return_transform=True)
+    except Exception as e:
+        raise PipelineError('Failed to preprocess image', str(e))
+
+    try:
+        # YOLO model is shared across requests via the model registry
+        with trace_stage('spine_detector'):
+            results = spine_detector.spine_detector(model_img, confidence_threshold=DETECTION_CONFIDENCE, device="cpu")
+    except FileNotFoundError as e:
+        raise PipelineError('Model file not found', f'{e}. Please ensure the model file exists.')
+    except Exception as e:
+        raise PipelineError('Failed to detect book spines', str(e))
+
+    _emit(on_event, 'detections', {'spines': results})
+
+    try:
+        # Crop from the full-resolution original (BGR, as OCR has always received)
+        # rather than the downscaled, letterboxed model input
+        with trace_stage('crop_image'):
+            crops = crop_image(img , map_boxes_to_original(results, transform), max_side=CROP_MAX_SIDE)
+
+        # Each spine is read at 0/90/270 degrees as its shape and a text-direction
+        # probe suggest; only low-confidence reads are retried at other rotations.
+        # EasyOCR reads each pass as one batch, Tesseract fans it out over a process pool
+        with trace_stage('ocr'):
+            outputs, rotations = read_oriented(crops, ocr.read)
+    except Exception as e:
+        raise PipelineError('Failed to process OCR', str(e))
+
+    for i, texts in enumerate(outputs):
+        _emit(on_event, 'ocr', {'spine': i, 'texts': texts, 'rotation': rotations[i]})
+
+    identify_errors = []
+    if not results:
+        book_info = None
+    else:
+        try:
+            with trace_stage('identify'):
+                book_info = identify(ocr_predictions=outputs,
+                                     on_book=lambda book: _emit(on_event, 'book', {'book': book}),
+                                     errors=identify_errors)
+        except Exception as e:
+            print(f"Error identifying books: {e}")
+            book_info = {
+                'error': 'Failed to identify books',
+                'message': str(e)
+            }
+
+    _emit(on_event, 'books', {'book_info': book_info})
+
+    result = {'spines': results, 'detections': outputs, 'book_info': book_info, 'identify_errors': identify_errors}
+    # Failed identifications (quota, timeouts, ...) are retried on the next upload,
+    # including shelves where only some chunks of spines failed
+    if not identify_errors and not (isinstance(book_info, dict) and 'error' in book_info):
+        result_cache.set(cache_key, result)
+
+    return {**result, 'cache': 'miss'}
+
+
+def _detect_batch(model_imgs) -> list:
+
+    """Detect spines on every image of a batch
+
+    With the inference scheduler enabled all images are submitted at once
+    and micro-batched there; otherwise they go through one batched predict.
+    """
+
+    if inference_scheduler.is_enabled():
+        return inference_scheduler.wait_for([inference_scheduler.submit(model_img, DETECTION_CONFIDENCE)
+                                             for model_img in model_imgs])
+    return spine_detector.spine_detector_batch(model_imgs, confidence_thresholds=DETECTION_CONFIDENCE)
+
+
+def dedupe_spines(spines, threshold=BATCH_DEDUP_THRESHOLD) -> list:
+
+    """Group spines of a batch that show the same book in overlapping photos
+
+    `spines` is a list of `(image_index, ocr_texts)`. Two spines are merged
+    when their OCR text has a trigram Dice score of at least `threshold`
+    and no group ends up with two spines from the same photo, since a shelf
+    can hold several copies of one book. Returns lists of indices into
+    `spines`, in order of their first member.
+    """
+
+    parent = list(range(len(spines)))
+    images = [{image} for image, _ in spines]
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    grams = [trigrams(normalise_spine_text(spine_text(texts))) for _, texts in spines]
+
+    # Only spines sharing a trigram are compared
+    index = {}
+    for i, spine_grams in enumerate(grams):
+        candidates = {}
+        for gram in spine_grams:
+            for j in index.get(gram, ()):
+                candidates[j] = candidates.get(j, 0) + 1
+            index.setdefault(gram, []).append(i)
+
+        for j, shared in sorted(candidates.items(), key=lambda item: -item[1]):
+            if 2 * shared / (len(spine_grams) + len(grams[j])) < threshold:
+                continue
+            a, b = find(i), find(j)
+            if a == b or images[a] & images[b]:
+                continue
+            parent[b] = a
+            images[a] |= images[b]
+
+    groups = {}
+    for i in range(len(spines)):
+        groups.setdefault(find(i), []).append(i)
+    return sorted(groups.values(), key=lambda members: members[0])
+
+
+def run_batch_pipeline(imgs, ocr_backend=None) -> dict:
+
+    """Run the pipeline over several photos of one bookcase in a single pass
+
+    All images are detected as one batch, every spine crop is read in one
+    OCR pass, spines seen in overlapping photos are merged and the
+    remaining ones are identified with a single `identify` call. Returns
+    per-image spines and OCR output, the number of unique spines and the
+    book info, where each book's `image`/`spine` points at the clearest
+    sighting and `seen_in` lists all of them. Results are not cached per
+    image.
+    """
+
+    try:
+        ocr = get_ocr_backend(ocr_backend)
+    except ValueError as e:
+        raise PipelineError('Invalid OCR backend', str(e), status=400)
+
+    try:
+        with trace_stage('preprocess_image'):
+            prepared = [preprocess_image(img , target_size=(640,640) , to_rgb=True , keep_aspect_ratio=True , return_transform=True)
+                        for img in imgs]
+    except Exception as e:
+        raise PipelineError('Failed to preprocess image', str(e))
+
+    try:
+        with trace_stage('spine_detector'):
+            results = _detect_batch([model_img for model_img, _ in prepared])
+    except FileNotFoundError as e:
+        raise PipelineError('Model file not found', f'{e}. Please ensure the model file exists.')
+    except Exception as e:
+        raise PipelineError('Failed to detect book spines', str(e))
+
+    try:
+        with trace_stage('crop_image'):
+            crops = [crop_image(img , map_boxes_to_original(boxes, transform), max_side=CROP_MAX_SIDE)
+                     for img, boxes, (_, transform) in zip(imgs, results, prepared)]
+
+        # Crops of every photo are read together: one OCR pass for the whole batch
+        owners = [(image, spine) for image, image_crops in enumerate(crops) for spine in range(len(image_crops))]
+        with trace_stage('ocr'):
+            pooled, pooled_rotations = read_oriented([crop for image_crops in crops for crop in image_crops], ocr.read)
+    except Exception as e:
+        raise PipelineError('Failed to process OCR', str(e))
+
+    detections = [[] for _ in imgs]
+    rotations = [[] for _ in imgs]
+    for (image, _), texts, rotation in zip(owners, pooled, pooled_rotations):
+        detections[image].append(texts)
+        rotations[image].append(rotation)
+
+    with trace_stage('dedupe_spines'):
+        groups = dedupe_spines([(image, texts) for (image, _), texts in zip(owners, pooled)])
+        # The most confident detection stands in for each book
+        representatives = [max(members, key=lambda i: results[owners[i][0]][owners[i][1]]['confidence'])
+                           for members in groups]
+
+    identify_errors = []
+    if not owners:
+        book_info = None
+    else:
+        try:
+            with trace_stage('identify'):
+                book_info = identify(ocr_predictions=[pooled[i] for i in representatives], errors=identify_errors)
+        except Exception as e:
+            print(f"Error identifying books: {e}")
+            book_info = {
+                'error': 'Failed to identify books',
+                'message': str(e)
+            }
+
+    # Point each book back at the photos it was seen in. identify() answers
+    # once per distinct text, so copies of a book on one shelf (kept apart by
+    # dedupe_spines) each get their own entry here
+    if isinstance(book_info, list):
+        groups_by_key = {}
+        for group, i in enumerate(representatives):
+            groups_by_key.setdefault(normalise_spine_text(spine_text(pooled[i])), []).append(group)
+
+        books = []
+        for book in book_info:
+            group = book.get('spine') if isinstance(book, dict) else None
+            if not isinstance(group, int) or not 0 <= group < len(groups):
+                books.append(book)
+                continue
+            for copy in groups_by_key[normalise_spine_text(spine_text(pooled[representatives[group]]))]:
+                image, spine = owners[representatives[copy]]
+                books.append({
+                    **book,
+                    'image': image,
+                    'spine': spine,
+                    'seen_in': [{'image': owners[i][0], 'spine': owners[i][1]} for i in groups[copy]]
+                })
+        book_info = books
+
+    # Failed chunks name the photos and spines that went unidentified
+    for error in identify_errors:
+        error['spines'] = [{'image': owners[i][0], 'spine': owners[i][1]}
+                           for group in error['spines'] for i in groups[group]]
+
+    return {
+        'spines': results,
+        'detections': detections,
+        'rotations': rotations,
+        'unique_spines': len(groups),
+        'book_info': book_info,
+        'identify_errors': identify_errors
+    }
@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+# Jobs queued or running at once; each holds a decoded image, so more are refused
+JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "16"))
+# Seconds a refused client is told to wait before retrying
+JOB_RETRY_AFTER = int(os.getenv("JOB_RETRY_AFTER", "5"))
+# Finished jobs are kept this long so clients can still fetch their results
+JOB_RESULT_TTL = float(os.getenv("JOB_RESULT_TTL", "600"))
+# Seconds between keep-alive comments on an idle event stream
+JOB_STREAM_KEEPALIVE = 15
+
+
+class JobQueueFullError(Exception):
+    """Too many identification jobs are queued or running; the caller should retry later"""
+
+
+class Job:
+
+    """State of one background identification job
+
+    Stages report progress with `add_event`; readers either take a
+    snapshot or block in `wait_for_events` until something new arrives.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.events = []
+        self.result = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._cond = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ('done', 'failed')
+
+    def add_event(self, name, data):
+        with self._cond:
+            self.events.append({'event': name, 'data': data, 'at': time.time()})
+            self._cond.notify_all()
+
+    def _finish(self, status, result):
+        with self._cond:
+            self.status = status
+            self.result = result
+            self.finished_at = time.time()
+            self.events.append({'event': status, 'data': result, 'at': self.finished_at})
+            self._cond.notify_all()
+
+    def wait_for_events(self, since, timeout):
+        """Return events after index `since`, waiting up to `timeout` seconds for one"""
+        with self._cond:
+            if len(self.events) <= since and not self.finished:
+                self._cond.wait(timeout)
+            return self.events[since:]
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                'job_id': self.id,
+                'status': self.status,
+                'events': list(self.events),
+                'result': self.result,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at,
+            }
+
+
+class JobManager:
+
+    """Runs jobs on a bounded thread pool and keeps them addressable by id
+
+    At most `max_pending` jobs are queued or running at once; `submit`
+    raises JobQueueFullError beyond that, so a burst of uploads is shed
+    instead of holding every decoded image in memory.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, result_ttl=JOB_RESULT_TTL, max_pending=JOB_MAX_PENDING):
+        self.result_ttl = result_ttl
+        self.max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="identify-job")
+        self._pending = threading.BoundedSemaphore(self.max_pending)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._stats = {"pending": 0, "rejected": 0}
+
+    def _count(self, name, n=1):
+        with self._lock:
+            self._stats[name] += n
+
+    def _refuse(self):
+        self._count("rejected")
+        raise JobQueueFullError("Too many identification jobs are queued, please retry shortly")
+
+    def check_capacity(self):
+        """Raise JobQueueFullError if a new job would be refused, before the caller decodes its upload"""
+        with self._lock:
+            full = self._stats["pending"] >= self.max_pending
+        if full:
+            self._refuse()
+
+    def submit(self, fn, *args, **kwargs) -> Job:
+
+        """Start `fn(*args, on_event=job.add_event, **kwargs)` in the background
+
+        `fn` returns the final result body, or raises an exception with a
+        `to_dict()` method (and optional `status`) to fail the job with it.
+        Raises JobQueueFullError when `max_pending` jobs are already waiting.
+        """
+
+        if not self._pending.acquire(blocking=False):
+            self._refuse()
+        self._count("pending")
+
+        job = Job()
+        with self._lock:
+            self._expire()
+            self._jobs[job.id] = job
+        try:
+            self._executor.submit(self._run, job, fn, args, kwargs)
+        except Exception:
+            self._done()
+            raise
+        return job
+
+    def _done(self):
+        self._count("pending", -1)
+        self._pending.release()
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = 'running'
+        try:
+            result = fn(*args, on_event=job.add_event, **kwargs)
+        except Exception as e:
+            if hasattr(e, 'to_dict'):
+                error = {**e.to_dict(), 'status_code': getattr(e, 'status', 500)}
+            else:
+                error = {'error': 'Internal server error', 'message': str(e), 'status_code': 500}
+            job._finish('failed', error)
+        else:
+            job._finish('done', result)
+        finally:
+            self._done()
+
+    def _expire(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self.result_ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {**self._stats, "max_pending": self.max_pending, "jobs": len(self._jobs)}
+
+
+def stream_events(job):
+
+    """Yield a job's events as Server-Sent Events until it finishes"""
+
+    sent = 0
+    while True:
+        events = job.wait_for_events(sent, JOB_STREAM_KEEPALIVE)
+        if not events:
+            yield ": keepalive\n\n"
+            continue
+        for event in events:
+            yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+        sent += len(events)
+        if events[-1]['event'] in ('done', 'failed'):
+            return
+
+
+job_manager = JobManager()
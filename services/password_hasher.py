@@ -0,0 +1,109 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import generate_password_hash, check_password_hash
+
+# werkzeug method string for new hashes, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+# Stored hashes made with other parameters are upgraded at the next login
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+# Hashing runs in its own processes so login bursts cannot hold the request workers' GIL
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Hash jobs queued or running at once; callers beyond that wait up to the timeout, then get HashingBusyError
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+
+
+class HashingBusyError(Exception):
+    """Too many password hash jobs are waiting; the caller should retry later"""
+
+
+def _hash(raw_password, method):
+    return generate_password_hash(raw_password, method=method)
+
+
+def _verify(password_hash, raw_password):
+    return check_password_hash(password_hash, raw_password)
+
+
+class PasswordHasher:
+
+    """Bounded process pool for password hashing and verification
+
+    At most `max_pending` jobs are queued or running; further callers wait
+    up to `queue_timeout` seconds for room and then get HashingBusyError,
+    so a login burst is shed instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers=PASSWORD_HASH_WORKERS, method=PASSWORD_HASH_METHOD,
+                 max_pending=PASSWORD_HASH_MAX_PENDING, queue_timeout=PASSWORD_HASH_QUEUE_TIMEOUT):
+        self.workers = max(1, workers)
+        self.method = method
+        self.queue_timeout = queue_timeout
+        self._pending = threading.BoundedSemaphore(max(1, max_pending))
+        self._pool = None
+        self._lock = threading.Lock()
+        self._method_prefix = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"hashes": 0, "verifications": 0, "rehashes": 0, "rejected": 0}
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._pool
+
+    def _count(self, name):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _run(self, fn, *args):
+        if not self._pending.acquire(timeout=self.queue_timeout):
+            self._count("rejected")
+            raise HashingBusyError("Password hashing is overloaded, please retry shortly")
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._pending.release()
+
+    def hash(self, raw_password) -> str:
+        self._count("hashes")
+        return self._run(_hash, raw_password, self.method)
+
+    def verify(self, password_hash, raw_password) -> bool:
+        self._count("verifications")
+        return self._run(_verify, password_hash, raw_password)
+
+    def method_prefix(self) -> str:
+
+        """The prefix werkzeug writes for `method`, with its parameters filled in
+
+        A method given without parameters ("scrypt", "pbkdf2:sha256") is
+        stored with werkzeug's defaults ("pbkdf2:sha256:600000"), so the
+        prefix is taken from one dummy hash rather than from `method`.
+        """
+
+        if self._method_prefix is None:
+            prefix = self._run(_hash, "method-prefix-probe", self.method).split("$", 1)[0]
+            self._method_prefix = prefix
+        return self._method_prefix
+
+    def needs_rehash(self, password_hash) -> bool:
+        """Whether a stored hash was made with other parameters than `method`"""
+        return password_hash.split("$", 1)[0] != self.method_prefix()
+
+    def count_rehash(self):
+        self._count("rehashes")
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["method"] = self.method.split(":", 1)[0]
+        stats["workers"] = self.workers
+        return stats
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,141 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+RESULT_CACHE_SIZE = int(os.getenv("RESULT_CACHE_SIZE", "256"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", str(24 * 60 * 60)))
+# Path of the SQLite file backing the on-disk tier; empty keeps the cache in memory only
+RESULT_CACHE_DB = os.getenv("RESULT_CACHE_DB", "")
+
+
+def image_cache_key(img, *params) -> str:
+
+    """Hash the decoded pixels of an image together with any parameters
+    that change the pipeline output (model version, thresholds, ...)"""
+
+    h = hashlib.sha256()
+    h.update(repr((img.shape, str(img.dtype), params)).encode())
+    h.update(memoryview(img if img.flags['C_CONTIGUOUS'] else img.copy()).cast('B'))
+    return h.hexdigest()
+
+
+class ResultCache:
+
+    """Two-tier LRU/TTL cache for JSON-serialisable pipeline results
+
+    The in-memory tier is an LRU bounded by `max_entries`. When `db_path`
+    is set, entries are also written to SQLite so they survive restarts;
+    a disk hit is promoted back into memory.
+    """
+
+    def __init__(self, max_entries=RESULT_CACHE_SIZE, ttl=RESULT_CACHE_TTL, db_path=RESULT_CACHE_DB):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path or None
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+        if self.db_path:
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS result_cache ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _expired(self, created_at) -> bool:
+        return self.ttl > 0 and time.time() - created_at > self.ttl
+
+    def get(self, key):
+
+        """Return the cached value for `key`, or None on a miss"""
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created_at, value = entry
+                if not self._expired(created_at):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    row = conn.execute(
+                        "SELECT value, created_at FROM result_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                    if row and self._expired(row[1]):
+                        conn.execute("DELETE FROM result_cache WHERE key = ?", (key,))
+                        row = None
+            except sqlite3.Error as e:
+                print(f"Result cache read failed: {e}")
+                row = None
+
+            if row:
+                value = json.loads(row[0])
+                with self._lock:
+                    self._store(key, value, row[1])
+                    self.hits += 1
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _store(self, key, value, created_at):
+        self._entries[key] = (created_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def set(self, key, value):
+
+        """Store `value` under `key` in memory and, if configured, on disk"""
+
+        created_at = time.time()
+        with self._lock:
+            self._store(key, value, created_at)
+
+        if self.db_path:
+            try:
+                with self._connect() as conn:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO result_cache (key, value, created_at) VALUES (?, ?, ?)",
+                        (key, json.dumps(value), created_at)
+                    )
+                    if self.ttl > 0:
+                        conn.execute("DELETE FROM result_cache WHERE created_at < ?", (created_at - self.ttl,))
+            except sqlite3.Error as e:
+                print(f"Result cache write failed: {e}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl,
+                "disk_tier": bool(self.db_path),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+result_cache = ResultCache()
@@ -0,0 +1,105 @@
+import re
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError, ProgrammingError
+from database.db_setup import db, read_replica
+
+DEFAULT_SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+# Title, authors, description weights for SQLite's bm25()
+FTS5_WEIGHTS = (10.0, 5.0, 1.0)
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+# PostgreSQL undefined_table / undefined_column
+_MISSING_SCHEMA_PGCODES = {"42P01", "42703"}
+_MISSING_SCHEMA_MESSAGES = ("no such table", "no such column", "no such module")
+
+_FTS5_QUERY = text(f"""
+    SELECT b.id, b.title, b.authors, b.isbn, b.read_at,
+           -bm25(user_read_books_fts, {', '.join(map(str, FTS5_WEIGHTS))}) AS rank
+    FROM user_read_books_fts
+    JOIN user_read_books AS b ON b.id = user_read_books_fts.rowid
+    WHERE user_read_books_fts MATCH :query AND b.user_id = :user_id
+    ORDER BY rank DESC, b.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+_TSVECTOR_QUERY = text("""
+    SELECT b.id, b.title, b.authors, b.isbn, b.read_at,
+           ts_rank_cd(b.search_vector, q) AS rank
+    FROM user_read_books AS b, websearch_to_tsquery('english', :query) AS q
+    WHERE b.user_id = :user_id AND b.search_vector @@ q
+    ORDER BY rank DESC, b.id DESC
+    LIMIT :limit OFFSET :offset
+""")
+
+
+class SearchUnavailableError(Exception):
+    """The configured database has no full-text search backend, or its migration has not been run"""
+
+
+def _missing_search_schema(error) -> bool:
+    """Whether a database error means the search table or column does not exist"""
+    orig = getattr(error, "orig", None)
+    if getattr(orig, "pgcode", None) in _MISSING_SCHEMA_PGCODES:
+        return True
+    message = str(orig or error).lower()
+    return any(text in message for text in _MISSING_SCHEMA_MESSAGES)
+
+
+def _fts5_query(query):
+    # Every word must match, as a prefix; quoting keeps FTS5 operators out of user input
+    return " ".join(f'"{token}"*' for token in _TOKEN_RE.findall(query))
+
+
+def search_read_books(user_id, query, limit=DEFAULT_SEARCH_PAGE_SIZE, offset=0) -> dict:
+
+    """Full-text search of a user's read books by title, author and description
+
+    Uses the SQLite FTS5 table or the PostgreSQL tsvector column created
+    by the migrations, whichever init_db selected for DATABASE_URL.
+    Results are ranked best first, with title matches weighted highest.
+    Returns `{'books': [...], 'next_offset': int | None}`.
+    """
+
+    backend = current_app.config.get("SEARCH_BACKEND")
+    if backend is None:
+        raise SearchUnavailableError("Full-text search needs a SQLite or PostgreSQL database")
+
+    limit = max(1, min(int(limit), MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, int(offset))
+
+    if backend == "fts5":
+        statement, query = _FTS5_QUERY, _fts5_query(query)
+    else:
+        statement = _TSVECTOR_QUERY
+    if not query.strip():
+        return {"books": [], "next_offset": None}
+
+    # One extra row tells whether another page exists
+    try:
+        with read_replica():
+            rows = db.session.execute(statement, {
+                "query": query, "user_id": user_id, "limit": limit + 1, "offset": offset
+            }).mappings().all()
+    except (OperationalError, ProgrammingError) as e:
+        db.session.rollback()
+        if not _missing_search_schema(e):
+            raise
+        raise SearchUnavailableError("Full-text search is not set up on this database; run `flask db upgrade`") from e
+
+    return {
+        "books": [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "authors": row["authors"],
+                "isbn": row["isbn"],
+                # SQLite returns raw strings for text() queries
+                "read_at": row["read_at"].isoformat() if hasattr(row["read_at"], "isoformat") else row["read_at"],
+                "rank": round(float(row["rank"]), 6),
+            }
+            for row in rows[:limit]
+        ],
+        "next_offset": offset + limit if len(rows) > limit else None,
+    }
@@ -0,0 +1,144 @@
+import os
+import time
+import uuid
+import threading
+from collections import OrderedDict, namedtuple
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
+from flask import current_app
+from database.db_setup import db, read_replica
+from database.models import User
+
+# Lifetime of an access token issued at login
+AUTH_TOKEN_TTL = int(os.getenv("AUTH_TOKEN_TTL", str(12 * 60 * 60)))
+# Verified principals are cached per token id so protected routes skip the database
+AUTH_PRINCIPAL_CACHE_SIZE = int(os.getenv("AUTH_PRINCIPAL_CACHE_SIZE", "1024"))
+AUTH_PRINCIPAL_CACHE_TTL = float(os.getenv("AUTH_PRINCIPAL_CACHE_TTL", "300"))
+
+_TOKEN_SALT = "book-finder-access-token"
+
+# What protected routes get to know about the caller
+Principal = namedtuple("Principal", ["id", "username", "email", "token_id"])
+
+
+class InvalidTokenError(Exception):
+    """The access token is missing, malformed, expired or revoked"""
+
+
+class PrincipalCache:
+
+    """LRU cache of principals keyed by token id, with a TTL and revocation
+
+    Revoked token ids are remembered until the token itself would have
+    expired. Both live in this process only: with several workers, a
+    revocation reaches the others when their cached entry expires.
+    """
+
+    def __init__(self, max_entries=AUTH_PRINCIPAL_CACHE_SIZE, ttl=AUTH_PRINCIPAL_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._revoked = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(token_id)
+            if entry is None or entry[1] <= now:
+                self._entries.pop(token_id, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token_id)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token_id, principal):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[token_id] = (principal, time.monotonic() + self.ttl)
+            self._entries.move_to_end(token_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revoke(self, token_id, expires_at):
+        with self._lock:
+            self._entries.pop(token_id, None)
+            self._revoked[token_id] = expires_at
+            # Forget revocations of tokens that have expired anyway
+            now = time.time()
+            for expired in [t for t, until in self._revoked.items() if until <= now]:
+                del self._revoked[expired]
+
+    def is_revoked(self, token_id) -> bool:
+        with self._lock:
+            return token_id in self._revoked
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "revoked": len(self._revoked),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config["SECRET_KEY"], salt=_TOKEN_SALT)
+
+
+def issue_token(user) -> dict:
+
+    """Create a signed access token for a user who has just logged in"""
+
+    token_id = uuid.uuid4().hex
+    token = _serializer().dumps({"uid": user.id, "jti": token_id})
+    principal_cache.set(token_id, Principal(user.id, user.username, user.email, token_id))
+    return {"access_token": token, "token_type": "Bearer", "expires_in": AUTH_TOKEN_TTL}
+
+
+def _load(token):
+    try:
+        data, issued_at = _serializer().loads(token, max_age=AUTH_TOKEN_TTL, return_timestamp=True)
+        return int(data["uid"]), str(data["jti"]), issued_at.timestamp()
+    except SignatureExpired:
+        raise InvalidTokenError("Token has expired")
+    except (BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidTokenError("Invalid token")
+
+
+def verify_token(token) -> Principal:
+
+    """Return the principal for a token, raising InvalidTokenError if it is not valid
+
+    The signature and expiry are checked on every call; the user row is
+    only read on a principal cache miss.
+    """
+
+    user_id, token_id, _ = _load(token)
+    if principal_cache.is_revoked(token_id):
+        raise InvalidTokenError("Token has been revoked")
+
+    principal = principal_cache.get(token_id)
+    if principal is not None:
+        return principal
+
+    with read_replica():
+        user = db.session.get(User, user_id)
+    if user is None:
+        raise InvalidTokenError("User no longer exists")
+    principal = Principal(user.id, user.username, user.email, token_id)
+    principal_cache.set(token_id, principal)
+    return principal
+
+
+def revoke_token(token):
+    """Revoke a token (e.g. at logout) until it would have expired"""
+    _, token_id, issued_at = _load(token)
+    principal_cache.revoke(token_id, issued_at + AUTH_TOKEN_TTL)
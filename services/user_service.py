@@ -1,14 +1,17 @@
-from werkzeug.security import generate_password_hash , check_password_hash
 from database.models import User
-from database.db_setup import db 
+from database.db_setup import db , read_replica
+from services.password_hasher import password_hasher
 
 
 
 def create_user(username: str, email: str, raw_password: str) -> 'User' :
-    """Create a new user and add to the database."""
+    """Create a new user and add to the database.
+
+    Raises HashingBusyError when the hashing pool is saturated.
+    """
     user = User(username=username,
                 email=email,
-                password_hash= generate_password_hash(raw_password))
+                password_hash= password_hasher.hash(raw_password))
     
     db.session.add(user)
     try:
@@ -20,13 +23,29 @@ def create_user(username: str, email: str, raw_password: str) -> 'User' :
     
 
 def authenticate_user(email: str, raw_password: str) -> 'User' :
-    """Authenticate a user by email and password."""
+    """Authenticate a user by email and password.
+
+    Hashes made with outdated parameters are replaced with a
+    PASSWORD_HASH_METHOD hash once the password has been verified.
+    Raises HashingBusyError when the hashing pool is saturated.
+    """
     
-    user = User.query.filter_by(email=email).first()
-    if user and check_password_hash(user.password_hash, raw_password):
-        return user
-    return None
+    with read_replica():
+        user = User.query.filter_by(email=email).first()
+    if not user or not password_hasher.verify(user.password_hash, raw_password):
+        return None
+
+    if password_hasher.needs_rehash(user.password_hash):
+        try:
+            user.password_hash = password_hasher.hash(raw_password)
+            db.session.commit()
+            password_hasher.count_rehash()
+        except Exception as e:
+            # The old hash still works; try again at the next login
+            db.session.rollback()
+            print(f"Password rehash failed for user {user.id}: {e}")
+    return user
     
 
 
-    
\ No newline at end of file
+    
@@ -0,0 +1,27 @@
+from functools import wraps
+from flask import request, jsonify, g
+from services.token_service import verify_token, InvalidTokenError
+
+
+def bearer_token():
+    """Return the token from an `Authorization: Bearer <token>` header, or None"""
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+def login_required(view):
+
+    """Require a valid access token; the caller is available as `g.principal`"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        token = bearer_token()
+        if token is None:
+            return jsonify({"error":"Authentication required."}),401
+        try:
+            g.principal = verify_token(token)
+        except InvalidTokenError as e:
+            return jsonify({"error":str(e)}),401
+        return view(*args, **kwargs)
+
+    return wrapper
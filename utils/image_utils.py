@@ -1,44 +1,201 @@
 from PIL import Image
-import io ,cv2
+import io ,os ,cv2 ,time ,threading
 import numpy as np
 
-def read_image(file):
+# Longest side an upload is decoded at; JPEGs are DCT-downscaled while decoding.
+# 0 decodes at full resolution.
+IMAGE_DECODE_MAX_SIDE = int(os.getenv("IMAGE_DECODE_MAX_SIDE", "2048"))
 
-    """Read image from uploaded file and convert to OpenCV format"""
+_REDUCED_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+_decode_lock = threading.Lock()
+_decode_stats = {'images': 0, 'peak_bytes_max': 0, 'peak_bytes_total': 0, 'seconds_total': 0.0}
+
+
+def _reduction_factor(size, max_side) -> int:
+    """Largest of 1/2/4/8 that keeps the longer side at or above `max_side`"""
+    if not max_side or not size:
+        return 1
+    longer = max(size)
+    factor = 1
+    for candidate in (2, 4, 8):
+        if longer / candidate >= max_side:
+            factor = candidate
+    return factor
+
+
+def _read_into_buffer(stream) -> np.ndarray:
+
+    """Read a whole upload stream into one preallocated uint8 array"""
+
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+
+    buf = np.empty(size, dtype=np.uint8)
+    view = memoryview(buf)
+    filled = 0
+    while filled < size:
+        if hasattr(stream, 'readinto'):
+            n = stream.readinto(view[filled:])
+        else:
+            chunk = stream.read(min(size - filled, 1024 * 1024))
+            n = len(chunk)
+            view[filled:filled + n] = chunk
+        if not n:
+            break
+        filled += n
+    return buf[:filled]
+
+
+def read_image(file, max_side=IMAGE_DECODE_MAX_SIDE, stats=None):
+
+    """Read image from uploaded file and convert to OpenCV format
+
+    The upload is read once into a preallocated buffer and decoded with
+    cv2.imdecode, at 1/2, 1/4 or 1/8 scale when the image is still at least
+    `max_side` pixels on its longer side afterwards. Formats OpenCV cannot
+    decode go through PIL. EXIF orientation is ignored, as it always was.
+    If `stats` is a dict it is filled with the decode figures.
+    """
+
+    start = time.perf_counter()
+    stream = getattr(file, 'stream', file)
+
+    # Only the header is parsed here; pixels are decoded below
+    stream.seek(0)
+    with Image.open(stream) as probe:
+        size, fmt = probe.size, probe.format
+    factor = _reduction_factor(size, max_side)
+
+    buf = _read_into_buffer(stream)
+    img_cv = cv2.imdecode(buf, _REDUCED_FLAGS[factor] | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img_cv is None:
+        img = Image.open(io.BytesIO(buf)).convert('RGB')
+        img_cv = cv2.cvtColor(np.asarray(img),cv2.COLOR_RGB2BGR)
+        factor = 1
+
+    # The encoded buffer and the decoded array are the only full-size allocations
+    peak_bytes = buf.nbytes + img_cv.nbytes
+    elapsed = time.perf_counter() - start
+    with _decode_lock:
+        _decode_stats['images'] += 1
+        _decode_stats['peak_bytes_max'] = max(_decode_stats['peak_bytes_max'], peak_bytes)
+        _decode_stats['peak_bytes_total'] += peak_bytes
+        _decode_stats['seconds_total'] += elapsed
+
+    if stats is not None:
+        stats.update({
+            'format': fmt,
+            'original_size': size,
+            'decoded_size': (img_cv.shape[1], img_cv.shape[0]),
+            'reduction': factor,
+            'encoded_bytes': buf.nbytes,
+            'peak_bytes': peak_bytes,
+            'seconds': elapsed
+        })
 
-    img = Image.open(io.BytesIO(file.read())).convert('RGB')
-    img_cv = cv2.cvtColor(np.array(img),cv2.COLOR_RGB2BGR)
     return img_cv
 
-def preprocess_image(img , target_size=(640,640), to_rgb=True, keep_aspect_ratio=True ):
+
+def decode_stats() -> dict:
+
+    """Aggregate decode figures since the process started"""
+
+    with _decode_lock:
+        s = dict(_decode_stats)
+    images = s['images'] or 1
+    return {
+        'images': s['images'],
+        'max_side': IMAGE_DECODE_MAX_SIDE,
+        'peak_mb_max': round(s['peak_bytes_max'] / (1024 * 1024), 2),
+        'peak_mb_avg': round(s['peak_bytes_total'] / images / (1024 * 1024), 2),
+        'avg_decode_ms': round(s['seconds_total'] / images * 1000, 2)
+    }
+
+def preprocess_image(img , target_size=(640,640), to_rgb=True, keep_aspect_ratio=True, return_transform=False ):
     
-    """Preprocess image for model input"""
+    """Preprocess image for model input
 
+    With `return_transform=True` the scale and padding applied are returned
+    as well, so boxes found on the model input can be mapped back with
+    `map_boxes_to_original`.
+    """
+
+    h , w = img.shape[:2]
     if keep_aspect_ratio:
-        h , w = img.shape[:2]
         scale = min(target_size[0]/h , target_size[1]/w)
         new_w , new_h = int(w*scale) , int(h*scale)
         resized_img = cv2.resize(img, (new_w , new_h), interpolation=cv2.INTER_LINEAR)
         padded_img = np.full((target_size[0],target_size[1], 3), 0, dtype=np.uint8)
         padded_img[0:new_h , 0:new_w] = resized_img
     else:
+        new_w , new_h = target_size
         padded_img = cv2.resize(img, target_size, interpolation=cv2.INTER_LINEAR)
     
     if to_rgb:
         padded_img = cv2.cvtColor(padded_img , cv2.COLOR_BGR2RGB)
     
+    if return_transform:
+        # The resized image sits in the top-left corner, so there is no offset
+        transform = {
+            'scale_x': new_w / w,
+            'scale_y': new_h / h,
+            'pad_x': 0,
+            'pad_y': 0,
+            'original_size': (w, h)
+        }
+        return padded_img, transform
 
     return padded_img
 
 
-def crop_image(img , detections)-> list :
+def map_boxes_to_original(detections, transform) -> list:
+
+    """Map detections on the model input back onto the original image
+
+    Returns new detections whose boxes are in original pixel coordinates,
+    clipped to the image bounds.
+    """
+
+    w, h = transform['original_size']
+    mapped = []
+    for item in detections:
+        x1 , y1 , x2 ,y2 = item['box']
+        x1 = (x1 - transform['pad_x']) / transform['scale_x']
+        x2 = (x2 - transform['pad_x']) / transform['scale_x']
+        y1 = (y1 - transform['pad_y']) / transform['scale_y']
+        y2 = (y2 - transform['pad_y']) / transform['scale_y']
+        box = [
+            min(max(int(x1), 0), w), min(max(int(y1), 0), h),
+            min(max(int(round(x2)), 0), w), min(max(int(round(y2)), 0), h)
+        ]
+        mapped.append({**item, 'box': box})
+    return mapped
+
+
+def crop_image(img , detections, max_side=None)-> list :
+
+    """Crop image using the given bounding box
 
-    """Crop image using the given bounding box"""
+    Crops are NumPy views into `img`, not copies. When `max_side` is set,
+    crops whose longer side exceeds it are downscaled to fit, which bounds
+    OCR cost when cropping from a full-resolution photo.
+    """
 
     cropped_images = []
     for item in detections:
         x1 , y1 , x2 ,y2 = item['box']
         cropped = img[y1:y2 , x1:x2]
+        if max_side and cropped.size and max(cropped.shape[:2]) > max_side:
+            scale = max_side / max(cropped.shape[:2])
+            new_size = (max(1, int(cropped.shape[1]*scale)), max(1, int(cropped.shape[0]*scale)))
+            cropped = cv2.resize(cropped, new_size, interpolation=cv2.INTER_AREA)
         cropped_images.append(cropped)
     
 
@@ -0,0 +1,199 @@
+import os
+import time
+import uuid
+import random
+import cProfile
+import threading
+import tracemalloc
+import contextvars
+from contextlib import contextmanager
+
+# Fraction of traced requests run under cProfile; profiles are written to PROFILE_DIR
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# tracemalloc slows Python allocations noticeably, so allocation tracking is opt-in
+TRACE_ALLOCATIONS = os.getenv("TRACE_ALLOCATIONS", "0") == "1"
+
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+# Callables adding gauges and counters from other modules to /metrics
+_collectors = []
+
+
+class Histogram:
+
+    """Cumulative Prometheus-style histogram keyed by a label tuple"""
+
+    def __init__(self, name, help_text, label_names, buckets=HISTOGRAM_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                pairs = [f'{k}="{v}"' for k, v in zip(self.label_names, labels)]
+                series_labels = "{" + ",".join(pairs) + "}" if pairs else ""
+                for bound, count in zip(self.buckets, series['counts']):
+                    bucket_labels = ",".join(pairs + [f'le="{bound}"'])
+                    lines.append(f'{self.name}_bucket{{{bucket_labels}}} {count}')
+                bucket_labels = ",".join(pairs + ['le="+Inf"'])
+                lines.append(f'{self.name}_bucket{{{bucket_labels}}} {series["count"]}')
+                lines.append(f'{self.name}_sum{series_labels} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{series_labels} {series["count"]}')
+        return lines
+
+
+stage_wall_seconds = Histogram(
+    "bookfinder_stage_wall_seconds", "Wall time per pipeline stage", ("endpoint", "stage"))
+stage_cpu_seconds = Histogram(
+    "bookfinder_stage_cpu_seconds", "CPU time of the calling thread per pipeline stage", ("endpoint", "stage"))
+request_seconds = Histogram(
+    "bookfinder_request_seconds", "Wall time per traced request", ("endpoint",))
+
+
+class RequestTrace:
+
+    """Per-request record of stage timings, optionally under cProfile"""
+
+    def __init__(self, endpoint, profile=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.endpoint = endpoint
+        self.stages = []
+        self._start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+        self.total_seconds = None
+        self.cpu_seconds = None
+
+        if profile is None:
+            profile = PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+        self._profiler = cProfile.Profile() if profile else None
+        self.profile_path = None
+        if self._profiler is not None:
+            self._profiler.enable()
+
+    def record(self, name, wall, cpu, alloc_bytes=None, peak_bytes=None):
+        entry = {'stage': name, 'wall_ms': round(wall * 1000, 3), 'cpu_ms': round(cpu * 1000, 3)}
+        if alloc_bytes is not None:
+            entry['alloc_kb'] = round(alloc_bytes / 1024, 1)
+            entry['peak_kb'] = round(peak_bytes / 1024, 1)
+        self.stages.append(entry)
+
+    def finish(self):
+        if self.total_seconds is not None:
+            return
+        self.total_seconds = time.perf_counter() - self._start
+        self.cpu_seconds = time.thread_time() - self._cpu_start
+        request_seconds.observe((self.endpoint,), self.total_seconds)
+
+        if self._profiler is not None:
+            self._profiler.disable()
+            os.makedirs(PROFILE_DIR, exist_ok=True)
+            self.profile_path = os.path.join(PROFILE_DIR, f"{self.endpoint}_{int(time.time())}_{self.id}.prof")
+            self._profiler.dump_stats(self.profile_path)
+
+    def to_dict(self) -> dict:
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self._start
+        cpu = self.cpu_seconds if self.cpu_seconds is not None else time.thread_time() - self._cpu_start
+        data = {
+            'trace_id': self.id,
+            'total_ms': round(total * 1000, 3),
+            'cpu_ms': round(cpu * 1000, 3),
+            'stages': self.stages
+        }
+        if self.profile_path:
+            data['profile'] = self.profile_path
+        return data
+
+
+def init_tracing(app=None):
+    """Start allocation tracking when TRACE_ALLOCATIONS=1"""
+    if TRACE_ALLOCATIONS and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+@contextmanager
+def start_trace(endpoint, profile=None):
+
+    """Make a new RequestTrace current for the enclosed block"""
+
+    trace = RequestTrace(endpoint, profile=profile)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_stage(name):
+
+    """Time a pipeline stage
+
+    Every stage feeds the Prometheus histograms; it is also added to the
+    current request trace when there is one. Allocation figures come from
+    tracemalloc and are process-wide, so they are approximate under
+    concurrent requests.
+    """
+
+    trace = _current_trace.get()
+    tracing_allocs = tracemalloc.is_tracing()
+    if tracing_allocs:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.thread_time() - cpu_start
+        endpoint = trace.endpoint if trace is not None else "none"
+        stage_wall_seconds.observe((endpoint, name), wall)
+        stage_cpu_seconds.observe((endpoint, name), cpu)
+
+        if trace is not None:
+            if tracing_allocs:
+                after, peak = tracemalloc.get_traced_memory()
+                trace.record(name, wall, cpu, after - before, peak - before)
+            else:
+                trace.record(name, wall, cpu)
+
+
+def register_collector(collect):
+    """Add `collect()`, returning Prometheus text lines, to what /metrics renders"""
+    _collectors.append(collect)
+
+
+def render_metrics() -> str:
+    """All histograms and registered collectors in the Prometheus text exposition format"""
+    lines = []
+    for histogram in (request_seconds, stage_wall_seconds, stage_cpu_seconds):
+        lines.extend(histogram.render())
+    for collect in list(_collectors):
+        try:
+            lines.extend(collect())
+        except Exception as e:
+            print(f"Error collecting metrics from {getattr(collect, '__name__', collect)}: {e}")
+    return "\n".join(lines) + "\n"